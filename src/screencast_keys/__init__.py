@@ -174,6 +174,7 @@ def register():
                 )
             else:
                 item.default_text = ops.EventType.names[event.name]
+    ops.invalidate_display_event_text()
 
     try:
         common.reload_custom_mouse_image(prefs, context)
@@ -188,6 +189,7 @@ def unregister():
     prefs = user_prefs.addons[__package__].preferences
     preferences.remove_custom_mouse_image(prefs, context)
     prefs.display_event_text_aliases_props.clear()
+    ops.invalidate_display_event_text()
 
     bpy.app.handlers.load_post.remove(load_post_handler)
     unregister_shortcut_key()
@@ -61,24 +61,75 @@ def debug_print(s):
         print(s)
 
 
-def ensure_custom_mouse_images():
-    image_names = [
-        CUSTOM_MOUSE_IMG_BASE_NAME,
-        CUSTOM_MOUSE_IMG_LMOUSE_NAME,
-        CUSTOM_MOUSE_IMG_RMOUSE_NAME,
-        CUSTOM_MOUSE_IMG_MMOUSE_NAME,
-    ]
+# GPU textures of the custom mouse images.
+# Format: {image_name: (filepath, mtime, texture)}
+custom_mouse_textures = {}
+# Incremented when custom_mouse_textures is changed.
+# pylint: disable=C0103
+custom_mouse_textures_generation = 0
 
-    for name in image_names:
-        if name in bpy.data.images:
-            image = bpy.data.images[name]
-            image.preview_ensure()
-            image.gl_load()
+
+def increment_custom_mouse_textures_generation():
+    # pylint: disable=W0603
+    global custom_mouse_textures_generation
+    custom_mouse_textures_generation += 1
+
+
+def get_file_mtime(filepath):
+    try:
+        return os.path.getmtime(filepath)
+    except OSError:
+        return None
+
+
+def cache_custom_mouse_texture(image_name, filepath=None):
+    if image_name not in bpy.data.images:
+        # Cache the absence to skip looking up the image on every frame.
+        custom_mouse_textures[image_name] = (filepath, None, None)
+        increment_custom_mouse_textures_generation()
+        return None
+
+    image = bpy.data.images[image_name]
+    if filepath is None:
+        filepath = bpy.path.abspath(image.filepath)
+    image.preview_ensure()
+    image.gl_load()
+    texture = gpu.texture.from_image(image)
+    custom_mouse_textures[image_name] = \
+        (filepath, get_file_mtime(filepath), texture)
+    increment_custom_mouse_textures_generation()
+
+    return texture
+
+
+def get_custom_mouse_texture(image_name):
+    """Get the GPU texture of the custom mouse image.
+
+    The texture is created only once unless the cache is invalidated.
+    """
+
+    entry = custom_mouse_textures.get(image_name)
+    if entry is None:
+        return cache_custom_mouse_texture(image_name)
+    return entry[2]
+
+
+def invalidate_custom_mouse_textures():
+    custom_mouse_textures.clear()
+    increment_custom_mouse_textures_generation()
 
 
 def reload_custom_mouse_image(prefs, _):
     def reload_image(filepath, image_name):
         if os.path.exists(filepath):
+            # Skip reloading if the same file is not modified.
+            entry = custom_mouse_textures.get(image_name)
+            if entry is not None and entry[2] is not None and \
+                    entry[0] == filepath and \
+                    entry[1] == get_file_mtime(filepath) and \
+                    image_name in bpy.data.images:
+                return
+
             if image_name in bpy.data.images:
                 image = bpy.data.images[image_name]
                 bpy.data.images.remove(image)
@@ -87,8 +138,7 @@ def reload_custom_mouse_image(prefs, _):
             image.use_fake_user = True
             if compat.check_version(5, 0, 0) >= 0:
                 image.colorspace_settings.name = 'Non-Color'
-            image.preview_ensure()
-            image.gl_load()
+            cache_custom_mouse_texture(image_name, filepath)
 
     # From Blender 5.0, the specification of bpy.types.AddonPreferences
     # is changed. This change does not allow dict based accesses.
@@ -129,43 +179,42 @@ def reload_custom_mouse_image(prefs, _):
             reload_image(prefs["custom_mouse_image_middle_mouse"],
                          CUSTOM_MOUSE_IMG_MMOUSE_NAME)
 
-    ensure_custom_mouse_images()
+
+# Platform specific texts for modifier keys.
+MODIFIER_DISPLAY_TEXT_MAPPINGS = {
+    "Windows": {
+        "Shift": "Shift",
+        "Ctrl": "Ctrl",
+        "Alt": "Alt",
+        "OS Key": "Windows Key",
+    },
+    "Darwin": {
+        "Shift": "Shift",
+        "Ctrl": "Control",
+        "Alt": "Option",
+        "OS Key": "Command",
+    },
+    "Linux": {
+        "Shift": "Shift",
+        "Ctrl": "Ctrl",
+        "Alt": "Alt",
+        "OS Key": "OS Key",
+    }
+}
+
+LEFT_RIGHT_IDENTIFIER_PATTERN = re.compile("(Left |Right )")
 
 
 def fix_modifier_display_text(name):
     # Remove left and right identifier.
-    fixed_name = re.sub("(Left |Right )", "", name)
-
-    mappings = {
-        "Windows": {
-            "Shift": "Shift",
-            "Ctrl": "Ctrl",
-            "Alt": "Alt",
-            "OS Key": "Windows Key",
-        },
-        "Darwin": {
-            "Shift": "Shift",
-            "Ctrl": "Control",
-            "Alt": "Option",
-            "OS Key": "Command",
-        },
-        "Linux": {
-            "Shift": "Shift",
-            "Ctrl": "Ctrl",
-            "Alt": "Alt",
-            "OS Key": "OS Key",
-        }
-    }
+    fixed_name = LEFT_RIGHT_IDENTIFIER_PATTERN.sub("", name)
 
     # Change to the platform specific text.
-    system = platform.system()
-    if system not in mappings:
-        return fixed_name
-    if fixed_name not in mappings[system]:
+    mapping = MODIFIER_DISPLAY_TEXT_MAPPINGS.get(platform.system())
+    if mapping is None:
         return fixed_name
 
-    fixed_name = mappings[system][fixed_name]
-    return fixed_name
+    return mapping.get(fixed_name, fixed_name)
 
 
 def use_3d_polyline(_):
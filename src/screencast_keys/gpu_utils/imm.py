@@ -41,6 +41,12 @@ class InternalData:
         inst.line_width = 1.0
         inst.scissor = None
         inst.original_scissor = None
+        inst.viewport_size = None
+        inst.tex = None
+        inst.batching = False
+        inst.recording = False
+        inst.commands = []
+        inst.draw_count = 0
 
         return inst
 
@@ -65,6 +71,21 @@ class InternalData:
     def add_vert(self, v):
         self.verts.append(v)
 
+    def add_template_verts(self, template, x, y, w, h, z=None):
+        # The vertex is (x + scale_x * w + offset_x,
+        #                y + scale_y * h + offset_y).
+        scale_x, scale_y, offset_x, offset_y = template
+        if z is None:
+            self.verts.extend(
+                (x + sx * w + ox, y + sy * h + oy)
+                for sx, sy, ox, oy
+                in zip(scale_x, scale_y, offset_x, offset_y))
+        else:
+            self.verts.extend(
+                (x + sx * w + ox, y + sy * h + oy, z)
+                for sx, sy, ox, oy
+                in zip(scale_x, scale_y, offset_x, offset_y))
+
     def add_tex_coord(self, uv):
         self.tex_coords.append(uv)
 
@@ -83,6 +104,21 @@ class InternalData:
     def set_original_scissor(self, scissor_box):
         self.original_scissor = scissor_box
 
+    def set_viewport_size(self, size):
+        self.viewport_size = size
+
+    def set_batching(self, batching):
+        self.batching = batching
+
+    def set_recording(self, recording):
+        self.recording = recording
+
+    def clear_commands(self):
+        self.commands = []
+
+    def increment_draw_count(self):
+        self.draw_count += 1
+
     def clear(self):
         self.prim_mode = None
         self.verts = []
@@ -116,6 +152,21 @@ class InternalData:
     def get_original_scissor(self):
         return self.original_scissor
 
+    def get_viewport_size(self):
+        return self.viewport_size
+
+    def get_draw_count(self):
+        return self.draw_count
+
+    def is_batching(self):
+        return self.batching
+
+    def is_recording(self):
+        return self.recording
+
+    def get_commands(self):
+        return self.commands
+
 
 # pylint: disable=C0103
 def immLineWidth(width):
@@ -203,13 +254,86 @@ def _get_shader(dims, prim_mode, has_texture, scissor_box):
         f"has_texture={has_texture}, scissor_box={scissor_box}")
 
 
-# pylint: disable=C0103
-def immEnd():
-    inst = InternalData.get_instance()
+def _get_indices(prim_mode, num_verts):
+    if prim_mode == GL_LINES:
+        return 'LINES', [(i, i + 1) for i in range(0, num_verts, 2)]
+    if prim_mode == GL_LINE_STRIP:
+        return 'LINES', [(i, i + 1) for i in range(num_verts - 1)]
+    if prim_mode == GL_LINE_LOOP:
+        indices = [(i, i + 1) for i in range(num_verts - 1)]
+        indices.append((num_verts - 1, 0))
+        return 'LINES', indices
+    if prim_mode == GL_TRIANGLES:
+        return 'TRIS', [(i, i + 1, i + 2) for i in range(0, num_verts, 3)]
+    if prim_mode == GL_TRIANGLE_FAN:
+        return 'TRIS', [(0, i, i + 1) for i in range(1, num_verts - 1)]
+    if prim_mode == GL_QUADS:
+        indices = []
+        for i in range(0, num_verts, 4):
+            indices.extend([(i, i + 1, i + 2), (i + 2, i + 3, i)])
+        return 'TRIS', indices
 
-    color = inst.get_color()
-    coords = inst.get_verts()
-    tex_coords = inst.get_tex_coords()
+    raise NotImplementedError(f"Not supported primitive mode {prim_mode}")
+
+
+class DrawCommand:
+    """Primitives which can be drawn by one batch.
+
+    All primitives in a command share the shader and the shader state, so
+    that their vertices can be merged into one vertex buffer.
+    """
+
+    def __init__(self, state, batch_type):
+        # (dims, prim_mode, has_texture, scissor_box, color, line_width,
+        #  texture, blend)
+        self.state = state
+        self.batch_type = batch_type
+        self.coords = []
+        self.tex_coords = []
+        self.indices = []
+        # Batch built for the last shader.
+        # The batch is reused when the command is drawn multiple times.
+        # The shader is determined by the state except for the scissor,
+        # and gpu.shader.from_builtin may return the different python
+        # object for the same shader. So the batch is identified by whether
+        # the scissor is used or not.
+        self.batch_key = None
+        self.batch = None
+
+    def add(self, coords, tex_coords, indices):
+        offset = len(self.coords)
+        self.coords.extend(coords)
+        self.tex_coords.extend(tex_coords)
+        if offset == 0:
+            self.indices.extend(indices)
+        else:
+            self.indices.extend(
+                tuple(i + offset for i in idx) for idx in indices)
+        self.batch = None
+
+    def get_batch(self, shader, has_texture, use_scissor):
+        if self.batch is not None and self.batch_key == use_scissor:
+            return self.batch
+
+        # Setup attributes.
+        if not has_texture:
+            data = {
+                "pos": self.coords,
+            }
+        else:
+            data = {
+                "pos": self.coords,
+                "texCoord": self.tex_coords
+            }
+
+        # Setup batch.
+        self.batch_key = use_scissor
+        self.batch = batch_for_shader(shader, self.batch_type, data,
+                                      indices=self.indices)
+        return self.batch
+
+
+def _get_scissor(inst):
     scissor_box = inst.get_scissor()
     # TODO: Other than OpenGL backend, scissor is not supported.
     #       Temporary turn off when gpu.state.scissor_set is implemented.
@@ -217,66 +341,51 @@ def immEnd():
             hasattr(gpu.platform, "backend_type_get") and \
             gpu.platform.backend_type_get() != 'OPENGL':
         scissor_box = None
+    if scissor_box is not None:
+        scissor_box = tuple(scissor_box)
+
+    return scissor_box
+
 
-    has_texture = len(tex_coords) != 0
+def _get_state(inst):
+    has_texture = len(inst.get_tex_coords()) != 0
     prim_mode = inst.get_prim_mode()
-    dims = inst.get_dims()
+    is_line = primitive_mode_is_line(prim_mode)
+
+    return (
+        inst.get_dims(),
+        GL_LINES if is_line else GL_TRIANGLES,
+        has_texture,
+        _get_scissor(inst),
+        tuple(inst.get_color()),
+        inst.get_line_width() if is_line else None,
+        inst.get_tex() if has_texture else None,
+        gpu.state.blend_get(),
+    )
+
+
+def _draw_command(command, scissor_box):
+    dims, prim_mode, has_texture, _, color, line_width, \
+        texture, blend = command.state
 
     # Get shader.
     shader, use_custom_shader = _get_shader(
         dims, prim_mode, has_texture, scissor_box)
-
-    # Setup attributes.
-    if len(tex_coords) == 0:
-        data = {
-            "pos": coords,
-        }
-    else:
-        data = {
-            "pos": coords,
-            "texCoord": tex_coords
-        }
-
-    # Setup batch.
-    if prim_mode == GL_LINES:
-        indices = []
-        for i in range(0, len(coords), 2):
-            indices.append([i, i + 1])
-        batch = batch_for_shader(shader, 'LINES', data, indices=indices)
-    elif prim_mode == GL_LINE_STRIP:
-        batch = batch_for_shader(shader, 'LINE_STRIP', data)
-    elif prim_mode == GL_LINE_LOOP:
-        data["pos"].append(data["pos"][0])
-        batch = batch_for_shader(shader, 'LINE_STRIP', data)
-    elif prim_mode == GL_TRIANGLES:
-        indices = []
-        for i in range(0, len(coords), 3):
-            indices.append([i, i + 1, i + 2])
-        batch = batch_for_shader(shader, 'TRIS', data, indices=indices)
-    elif prim_mode == GL_TRIANGLE_FAN:
-        indices = []
-        for i in range(1, len(coords) - 1):
-            indices.append([0, i, i + 1])
-        batch = batch_for_shader(shader, 'TRIS', data, indices=indices)
-    elif prim_mode == GL_QUADS:
-        indices = []
-        for i in range(0, len(coords), 4):
-            indices.extend([[i, i + 1, i + 2], [i + 2, i + 3, i]])
-        batch = batch_for_shader(shader, 'TRIS', data, indices=indices)
-    else:
-        raise NotImplementedError(
-            f"Not supported primitive mode {prim_mode}")
+    batch = command.get_batch(shader, has_texture, scissor_box is not None)
 
     # Set parameters for shader.
     shader.bind()
-    if prim_mode in [GL_LINES, GL_LINE_STRIP, GL_LINE_LOOP]:
-        region = bpy.context.region
+    if prim_mode == GL_LINES:
+        viewport_size = InternalData.get_instance().get_viewport_size()
+        if viewport_size is None:
+            region = bpy.context.region
+            viewport_size = [region.width, region.height]
         projection_matrix = gpu.matrix.get_projection_matrix()
         model_view_matrix = gpu.matrix.get_model_view_matrix()
         mvp_matrix = projection_matrix @ model_view_matrix
         shader.uniform_float("ModelViewProjectionMatrix", mvp_matrix)
-        shader.uniform_float("viewportSize", [region.width, region.height])
-        shader.uniform_float("lineWidth", inst.get_line_width())
+        shader.uniform_float("viewportSize", viewport_size)
+        shader.uniform_float("lineWidth", line_width)
         shader.uniform_float("color", color)
         if scissor_box is not None:
             if use_custom_shader:
@@ -289,7 +398,7 @@ def immEnd():
     else:
         if dims == 2:
             if has_texture:
-                shader.uniform_sampler("image", inst.get_tex())
+                shader.uniform_sampler("image", texture)
             projection_matrix = gpu.matrix.get_projection_matrix()
             model_view_matrix = gpu.matrix.get_model_view_matrix()
             mvp_matrix = projection_matrix @ model_view_matrix
@@ -304,12 +413,113 @@ def immEnd():
                                           scissor_box[3] - scissor_box[1])
 
     # Draw.
+    original_blend = gpu.state.blend_get()
+    if original_blend != blend:
+        gpu.state.blend_set(blend)
     batch.draw(shader)
+    if original_blend != blend:
+        gpu.state.blend_set(original_blend)
+    InternalData.get_instance().increment_draw_count()
+
+
+# pylint: disable=C0103
+def immEnd():
+    inst = InternalData.get_instance()
+
+    coords = inst.get_verts()
+    state = _get_state(inst)
+    batch_type, indices = _get_indices(inst.get_prim_mode(), len(coords))
+
+    if inst.is_batching() or inst.is_recording():
+        # Merge into the last command if the state is same.
+        # Only the last command is checked to keep the drawing order.
+        commands = inst.get_commands()
+        if len(commands) == 0 or commands[-1].state != state:
+            commands.append(DrawCommand(state, batch_type))
+        commands[-1].add(coords, inst.get_tex_coords(), indices)
+    else:
+        command = DrawCommand(state, batch_type)
+        command.add(coords, inst.get_tex_coords(), indices)
+        _draw_command(command, state[3])
 
-    del batch
     inst.clear()
 
 
+# pylint: disable=C0103
+def immBatchBegin():
+    """Start recording primitives instead of drawing them immediately.
+
+    Recorded primitives are drawn by immBatchFlush() or immBatchEnd().
+    """
+    inst = InternalData.get_instance()
+    immBatchFlush()
+    inst.set_batching(True)
+
+
+# pylint: disable=C0103
+def immBatchFlush():
+    """Draw recorded primitives.
+
+    This must be called before drawing with other than this module
+    (ex. blf) to keep the drawing order.
+    """
+    inst = InternalData.get_instance()
+    if inst.is_recording():
+        return
+    commands = inst.get_commands()
+    if len(commands) == 0:
+        return
+    inst.clear_commands()
+    for command in commands:
+        _draw_command(command, command.state[3])
+
+
+# pylint: disable=C0103
+def immBatchEnd():
+    immBatchFlush()
+    inst = InternalData.get_instance()
+    inst.set_batching(False)
+
+
+# pylint: disable=C0103
+def immRecordBegin():
+    """Start recording primitives to draw them later by immDrawCommands().
+
+    The current scissor box is not recorded. The scissor box at the time
+    when the commands are drawn is used instead.
+    """
+    immBatchFlush()
+    inst = InternalData.get_instance()
+    inst.set_recording(True)
+
+
+# pylint: disable=C0103
+def immRecordEnd():
+    """Finish recording primitives and return the recorded commands."""
+    inst = InternalData.get_instance()
+    commands = inst.get_commands()
+    inst.clear_commands()
+    inst.set_recording(False)
+
+    return commands
+
+
+# pylint: disable=C0103
+def immDrawCommands(commands, translation=(0.0, 0.0)):
+    """Draw commands recorded by immRecordBegin() and immRecordEnd().
+
+    The GPU batches are built at the first draw and reused after that.
+    """
+    immBatchFlush()
+    inst = InternalData.get_instance()
+    scissor_box = _get_scissor(inst)
+
+    with gpu.matrix.push_pop():
+        gpu.matrix.translate(translation)
+        for command in commands:
+            _draw_command(command, scissor_box)
+
+
 # pylint: disable=C0103
 def immVertex2f(x, y):
     inst = InternalData.get_instance()
@@ -324,6 +534,25 @@ def immVertex3f(x, y, z):
     inst.set_dims(3)
 
 
+# pylint: disable=C0103
+def immVertexTemplate2f(template, x, y, w, h):
+    """Add the vertices of the template placed at (x, y) with size (w, h).
+
+    template: (scale_x, scale_y, offset_x, offset_y)
+    """
+    inst = InternalData.get_instance()
+    inst.add_template_verts(template, x, y, w, h)
+    inst.set_dims(2)
+
+
+# pylint: disable=C0103
+def immVertexTemplate3f(template, x, y, w, h, z=0.0):
+    """Same as immVertexTemplate2f() but the vertices have z coordinate."""
+    inst = InternalData.get_instance()
+    inst.add_template_verts(template, x, y, w, h, z)
+    inst.set_dims(3)
+
+
 # pylint: disable=C0103
 def immTexCoord2f(u, v):
     inst = InternalData.get_instance()
@@ -336,8 +565,24 @@ def immSetTexture(texture):
     inst.set_tex(texture)
 
 
+# pylint: disable=C0103
+def immSetViewportSize(size):
+    """Set the viewport size used to draw lines.
+
+    The size of the current region is used if size is None.
+    This is needed to draw lines into an offscreen buffer.
+    """
+    immBatchFlush()
+
+    inst = InternalData.get_instance()
+    inst.set_viewport_size(size)
+
+
 # pylint: disable=C0103
 def immSetScissor(scissor_box):
+    # Recorded primitives must be drawn with the current scissor test state.
+    immBatchFlush()
+
     inst = InternalData.get_instance()
     inst.set_scissor(scissor_box)
 
@@ -356,3 +601,11 @@ def immSetScissor(scissor_box):
             gpu.state.scissor_set(orig_box[0], orig_box[1],
                                   orig_box[2] - orig_box[0],
                                   orig_box[3] - orig_box[1])
+
+
+# pylint: disable=C0103
+def immGetDrawCount():
+    """Return the number of the batches drawn so far."""
+
+    inst = InternalData.get_instance()
+    return inst.get_draw_count()
@@ -22,6 +22,7 @@
 import os
 import platform
 import math
+import array
 import collections
 import enum
 import time
@@ -37,6 +38,7 @@ import blf
 import bpy
 import bpy.props
 import gpu
+from mathutils import Matrix
 
 from . import common
 from .common import (
@@ -48,6 +50,7 @@ from .utils.bl_class_registry import BlClassRegistry
 from .utils import compatibility as compat
 from . import c_structure as cstruct    # extensions.blender.org: Delete line
 from .gpu_utils import imm
+from .profiler import profiler, tracer
 
 
 event_type_enum_items = bpy.types.Event.bl_rna.properties["type"].enum_items
@@ -57,17 +60,176 @@ EventType = enum.IntEnum(
 )
 EventType.names = {e.identifier: e.name for e in event_type_enum_items}
 
+# Flags to classify the events.
+EVENT_FLAG_IGNORE = 1 << 0      # Never shown in the event history.
+EVENT_FLAG_MOUSE = 1 << 1       # Ignored unless mouse events are shown.
+EVENT_FLAG_MODIFIER = 1 << 2
+EVENT_FLAG_TIMER = 1 << 3
+EVENT_FLAG_POINTER = 1 << 4     # Only moves the mouse cursor.
+
+# Class of the event which is not found in EventType.
+UNKNOWN_EVENT_CLASS = (None, EVENT_FLAG_IGNORE)
+
+
+def classify_event_types(ignore_event_types, mouse_event_types,
+                         modifier_event_types, pointer_event_types):
+    """Return the classification table of all events.
+
+    Format: {Event.type: (EventType, flags)}
+    """
+
+    event_classes = {}
+    for event_type in EventType:
+        name = event_type.name
+        flags = 0
+        if event_type in ignore_event_types or name.startswith("EVT_TWEAK"):
+            flags |= EVENT_FLAG_IGNORE
+        if name.startswith("TIMER"):
+            flags |= EVENT_FLAG_TIMER | EVENT_FLAG_IGNORE
+        if event_type in mouse_event_types:
+            flags |= EVENT_FLAG_MOUSE
+        if event_type in modifier_event_types:
+            flags |= EVENT_FLAG_MODIFIER
+        if name in pointer_event_types:
+            flags |= EVENT_FLAG_POINTER
+        event_classes[name] = (event_type, flags)
+    return event_classes
+
+
+class TextMetricsCache:
+    """LRU cache in front of blf.dimensions.
+
+    Cached dimensions are valid only for the font size set by set_size.
+    The cache is cleared when the font size or the DPI is changed.
+    """
+
+    DEFAULT_CAPACITY = 512
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        # Format: {(font_id, font_size, dpi, ui_scale, text): (width, height)}
+        self.cache = collections.OrderedDict()
+        self.font_size = None
+        self.dpi = None
+        self.ui_scale = None
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self):
+        self.cache.clear()
+
+    def reset_counters(self):
+        self.hits = 0
+        self.misses = 0
+
+    def set_size(self, font_id, font_size, dpi, ui_scale):
+        """Set font size to blf and invalidate cache if font is changed."""
+
+        compat.blf_size(font_id, font_size, dpi)
+        if font_size != self.font_size or dpi != self.dpi:
+            self.clear()
+            self.font_size = font_size
+            self.dpi = dpi
+        self.ui_scale = ui_scale
+
+    def size_key(self, font_id):
+        """Return the values which determine the dimensions of texts."""
+
+        return (font_id, self.font_size, self.dpi, self.ui_scale)
+
+    def dimensions(self, font_id, text):
+        key = (font_id, self.font_size, self.dpi, self.ui_scale, text)
+        cache = self.cache
+        dims = cache.get(key)
+        if dims is not None:
+            cache.move_to_end(key)
+            self.hits += 1
+            return dims
+
+        self.misses += 1
+        profiler.count("blf.dimensions")
+        dims = tuple(blf.dimensions(font_id, text))
+        cache[key] = dims
+        if len(cache) > self.capacity:
+            cache.popitem(last=False)
+        return dims
+
+
+text_metrics = TextMetricsCache()
+
+profiler.add_counter_source("imm.batches", imm.immGetDrawCount)
+
+
+class DefaultMouseCommandsCache:
+    """Cache of the draw commands of the default mouse icon.
+
+    The draw commands are recorded at the origin for each combination of
+    the pressed buttons, and drawn with translation.
+    All commands are discarded when the size or the color is changed.
+    """
+
+    def __init__(self):
+        # (w, h, color, round_radius, fill, fill_color, line_thickness)
+        self.key = None
+        # Format: {(left_pressed, middle_pressed, right_pressed):
+        #              [imm.DrawCommand, ...]}
+        self.commands = {}
+
+    def clear(self):
+        self.key = None
+        self.commands = {}
+
+    def get(self, key, pressed):
+        if key != self.key:
+            self.clear()
+            self.key = key
+            return None
+        return self.commands.get(pressed)
+
+    def set(self, pressed, commands):
+        self.commands[pressed] = commands
+
+
+default_mouse_commands = DefaultMouseCommandsCache()
+
 
 def draw_default_mouse(x, y, w, h, left_button_status,
                        right_button_status, middle_button_status,
                        color, round_radius, fill=False, fill_color=None,
                        line_thickness=1):
-    mouse_body = [x, y, w, h / 2]
-    left_mouse_button = [x, y + h / 2, w / 3, h / 2]
-    middle_mouse_button = [x + w / 3, y + h / 2, w / 3, h / 2]
-    right_mouse_button = [x + 2 * w / 3, y + h / 2, w / 3, h / 2]
+    key = (w, h, tuple(color), round_radius, fill,
+           tuple(fill_color) if fill else None, line_thickness)
+    pressed = (left_button_status in ('PRESS', 'CLICK_DRAG'),
+               middle_button_status in ('PRESS', 'CLICK_DRAG'),
+               right_button_status in ('PRESS', 'CLICK_DRAG'))
+
+    commands = default_mouse_commands.get(key, pressed)
+    if commands is None:
+        imm.immRecordBegin()
+        _draw_default_mouse_boxes(w, h, pressed, color, round_radius,
+                                  fill, fill_color, line_thickness)
+        commands = imm.immRecordEnd()
+        default_mouse_commands.set(pressed, commands)
+
+    imm.immDrawCommands(commands, (x, y))
+
+
+def _draw_default_mouse_boxes(w, h, pressed, color, round_radius,
+                              fill, fill_color, line_thickness):
+    mouse_body = [0, 0, w, h / 2]
+    left_mouse_button = [0, h / 2, w / 3, h / 2]
+    middle_mouse_button = [w / 3, h / 2, w / 3, h / 2]
+    right_mouse_button = [2 * w / 3, h / 2, w / 3, h / 2]
+
+    buttons = [
+        [left_mouse_button, [False, False, False, True], pressed[0]],
+        [middle_mouse_button, [False, False, False, False], pressed[1]],
+        [right_mouse_button, [False, False, True, False], pressed[2]],
+    ]
 
-    # Mouse body.
+    # Draw the boxes sharing the same color and primitive type in a row so
+    # that they are merged into one batch.
+    # Fill the mouse body and buttons.
     if fill:
         draw_rounded_box(mouse_body[0], mouse_body[1],
                          mouse_body[2], mouse_body[3],
@@ -75,87 +237,35 @@ def draw_default_mouse(x, y, w, h, left_button_status,
                          fill=True, color=fill_color,
                          round_corner=[True, True, False, False],
                          line_thickness=line_thickness)
+        for button, round_corner, _ in buttons:
+            draw_rounded_box(button[0], button[1], button[2], button[3],
+                             round_radius / 2,
+                             fill=True, color=fill_color,
+                             round_corner=round_corner,
+                             line_thickness=line_thickness)
+
+    # Fill the pressed buttons.
+    for button, round_corner, button_pressed in buttons:
+        if button_pressed:
+            draw_rounded_box(button[0], button[1], button[2], button[3],
+                             round_radius / 2,
+                             fill=True, color=color,
+                             round_corner=round_corner,
+                             line_thickness=line_thickness)
+
+    # Outline the mouse body and buttons.
     draw_rounded_box(mouse_body[0], mouse_body[1],
                      mouse_body[2], mouse_body[3],
                      round_radius,
                      fill=False, color=color,
                      round_corner=[True, True, False, False],
                      line_thickness=line_thickness)
-
-    # Left button.
-    if fill:
-        draw_rounded_box(
-            left_mouse_button[0], left_mouse_button[1],
-            left_mouse_button[2], left_mouse_button[3],
-            round_radius / 2,
-            fill=True, color=fill_color,
-            round_corner=[False, False, False, True],
-            line_thickness=line_thickness)
-    draw_rounded_box(
-        left_mouse_button[0], left_mouse_button[1],
-        left_mouse_button[2], left_mouse_button[3],
-        round_radius / 2,
-        fill=False, color=color,
-        round_corner=[False, False, False, True],
-        line_thickness=line_thickness)
-    if left_button_status in ('PRESS', 'CLICK_DRAG'):
-        draw_rounded_box(
-            left_mouse_button[0], left_mouse_button[1],
-            left_mouse_button[2], left_mouse_button[3],
-            round_radius / 2,
-            fill=True, color=color,
-            round_corner=[False, False, False, True],
-            line_thickness=line_thickness)
-
-    # Middle button.
-    if fill:
-        draw_rounded_box(
-            middle_mouse_button[0], middle_mouse_button[1],
-            middle_mouse_button[2], middle_mouse_button[3],
-            round_radius / 2,
-            fill=True, color=fill_color,
-            round_corner=[False, False, False, False],
-            line_thickness=line_thickness)
-    draw_rounded_box(
-        middle_mouse_button[0], middle_mouse_button[1],
-        middle_mouse_button[2], middle_mouse_button[3],
-        round_radius / 2,
-        fill=False, color=color,
-        round_corner=[False, False, False, False],
-        line_thickness=line_thickness)
-    if middle_button_status in ('PRESS', 'CLICK_DRAG'):
-        draw_rounded_box(
-            middle_mouse_button[0], middle_mouse_button[1],
-            middle_mouse_button[2], middle_mouse_button[3],
-            round_radius / 2,
-            fill=True, color=color,
-            round_corner=[False, False, False, False],
-            line_thickness=line_thickness)
-
-    # Right button.
-    if fill:
-        draw_rounded_box(
-            right_mouse_button[0], right_mouse_button[1],
-            right_mouse_button[2], right_mouse_button[3],
-            round_radius / 2,
-            fill=True, color=fill_color,
-            round_corner=[False, False, True, False],
-            line_thickness=line_thickness)
-    draw_rounded_box(
-        right_mouse_button[0], right_mouse_button[1],
-        right_mouse_button[2], right_mouse_button[3],
-        round_radius / 2,
-        fill=False, color=color,
-        round_corner=[False, False, True, False],
-        line_thickness=line_thickness)
-    if right_button_status in ('PRESS', 'CLICK_DRAG'):
-        draw_rounded_box(
-            right_mouse_button[0], right_mouse_button[1],
-            right_mouse_button[2], right_mouse_button[3],
-            round_radius / 2,
-            fill=True, color=color,
-            round_corner=[False, False, True, False],
-            line_thickness=line_thickness)
+    for button, round_corner, _ in buttons:
+        draw_rounded_box(button[0], button[1], button[2], button[3],
+                         round_radius / 2,
+                         fill=False, color=color,
+                         round_corner=round_corner,
+                         line_thickness=line_thickness)
 
 
 def draw_custom_mouse(x, y, w, h, left_button_status,
@@ -163,8 +273,10 @@ def draw_custom_mouse(x, y, w, h, left_button_status,
                       display_mode,
                       image_name_base, image_name_lmouse,
                       image_name_rmouse, image_name_mmouse):
-    def draw_image(img, positions, tex_coords):
-        gpu_img = gpu.texture.from_image(img)
+    def draw_image(image_name, positions, tex_coords):
+        gpu_img = common.get_custom_mouse_texture(image_name)
+        if gpu_img is None:
+            return
         original_state = gpu.state.blend_get()
         gpu.state.blend_set('ALPHA')
 
@@ -179,6 +291,9 @@ def draw_custom_mouse(x, y, w, h, left_button_status,
 
         gpu.state.blend_set(original_state)
 
+    def exists(image_name):
+        return common.get_custom_mouse_texture(image_name) is not None
+
     def pressed(button_status):
         return button_status in ('PRESS', 'CLICK_DRAG')
 
@@ -195,49 +310,56 @@ def draw_custom_mouse(x, y, w, h, left_button_status,
         [1.0, 0.0],
     ]
 
-    common.ensure_custom_mouse_images()
-
     if display_mode == 'OVERLAY':
-        if image_name_base in bpy.data.images:
-            draw_image(bpy.data.images[image_name_base], positions, tex_coords)
-        if pressed(left_button_status) and \
-                (image_name_lmouse in bpy.data.images):
-            draw_image(bpy.data.images[image_name_lmouse], positions,
-                       tex_coords)
-        if pressed(right_button_status) and \
-                (image_name_rmouse in bpy.data.images):
-            draw_image(bpy.data.images[image_name_rmouse], positions,
-                       tex_coords)
-        if pressed(middle_button_status) and \
-                (image_name_mmouse in bpy.data.images):
-            draw_image(bpy.data.images[image_name_mmouse], positions,
-                       tex_coords)
+        draw_image(image_name_base, positions, tex_coords)
+        if pressed(left_button_status):
+            draw_image(image_name_lmouse, positions, tex_coords)
+        if pressed(right_button_status):
+            draw_image(image_name_rmouse, positions, tex_coords)
+        if pressed(middle_button_status):
+            draw_image(image_name_mmouse, positions, tex_coords)
     elif display_mode == 'NORMAL':
-        if pressed(left_button_status) and \
-                (image_name_lmouse in bpy.data.images):
-            draw_image(bpy.data.images[image_name_lmouse], positions,
-                       tex_coords)
-        elif pressed(right_button_status) and \
-                (image_name_rmouse in bpy.data.images):
-            draw_image(bpy.data.images[image_name_rmouse], positions,
-                       tex_coords)
-        elif pressed(middle_button_status) and \
-                (image_name_mmouse in bpy.data.images):
-            draw_image(bpy.data.images[image_name_mmouse], positions,
-                       tex_coords)
-        elif image_name_base in bpy.data.images:
-            draw_image(bpy.data.images[image_name_base], positions, tex_coords)
+        if pressed(left_button_status) and exists(image_name_lmouse):
+            draw_image(image_name_lmouse, positions, tex_coords)
+        elif pressed(right_button_status) and exists(image_name_rmouse):
+            draw_image(image_name_rmouse, positions, tex_coords)
+        elif pressed(middle_button_status) and exists(image_name_mmouse):
+            draw_image(image_name_mmouse, positions, tex_coords)
+        else:
+            draw_image(image_name_base, positions, tex_coords)
 
 
-def draw_rounded_box(x, y, w, h, round_radius, fill=False,
-                     color=None, round_corner=None, line_thickness=1):
-    """round_corner: [Right Bottom, Left Bottom, Right Top, Left Top]"""
+class RoundedBoxGeometryCache:
+    """Cache of the vertex templates of rounded box.
 
-    if color is None:
-        color = [1.0, 1.0, 1.0, 1.0]
-    if round_corner is None:
-        round_corner = [True, True, True, True]
+    The vertex of the rounded box whose origin is (x, y) and size is (w, h)
+    is (x + scale_x * w + offset_x, y + scale_y * h + offset_y).
+    The template is shared by the filled box and the outlined box because
+    both use the same vertices.
+    """
+
+    DEFAULT_CAPACITY = 64
+
+    # [Right Bottom, Left Bottom, Right Top, Left Top]
+    CORNER_SCALES = [(0.0, 0.0), (1.0, 0.0), (1.0, 1.0), (0.0, 1.0)]
+    CORNER_DIRECTIONS = [(1.0, 1.0), (-1.0, 1.0), (-1.0, -1.0), (1.0, -1.0)]
+    CORNER_ANGLE_STARTS = [
+        math.pi * 1.0,
+        math.pi * 1.5,
+        math.pi * 0.0,
+        math.pi * 0.5,
+    ]
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        # Format: {(round_radius, round_corner):
+        #              (scale_x, scale_y, offset_x, offset_y)}
+        self.cache = {}
 
+    def clear(self):
+        self.cache.clear()
+
+    @staticmethod
     def circle_verts_num(r):
         """Get number of verticies for circle optimized for drawing."""
 
@@ -250,30 +372,55 @@ def draw_rounded_box(x, y, w, h, round_radius, fill=False,
             if num_verts < 1:
                 return 1
 
-    num_verts = circle_verts_num(round_radius)
-    n = int(num_verts / 4) + 1
-    dangle = math.pi * 2 / num_verts
+    def get(self, round_radius, round_corner):
+        key = (round_radius, tuple(round_corner))
+        template = self.cache.get(key)
+        if template is not None:
+            return template
 
-    radius = [round_radius if rc else 0 for rc in round_corner]
+        template = self._build(round_radius, round_corner)
+        if len(self.cache) >= self.capacity:
+            self.cache.clear()
+        self.cache[key] = template
+        return template
+
+    @classmethod
+    def _build(cls, round_radius, round_corner):
+        num_verts = cls.circle_verts_num(round_radius)
+        n = int(num_verts / 4) + 1
+        dangle = math.pi * 2 / num_verts
+
+        scale_x = array.array('f')
+        scale_y = array.array('f')
+        offset_x = array.array('f')
+        offset_y = array.array('f')
+        for rc, (sx, sy), (dx, dy), angle in zip(
+                round_corner, cls.CORNER_SCALES, cls.CORNER_DIRECTIONS,
+                cls.CORNER_ANGLE_STARTS):
+            r = round_radius if rc else 0
+            for _ in range(n):
+                scale_x.append(sx)
+                scale_y.append(sy)
+                offset_x.append(dx * r + r * math.cos(angle))
+                offset_y.append(dy * r + r * math.sin(angle))
+                angle += dangle
+
+        return scale_x, scale_y, offset_x, offset_y
+
+
+rounded_box_geometry = RoundedBoxGeometryCache()
 
-    x_origin = [
-        x + radius[0],
-        x + w - radius[1],
-        x + w - radius[2],
-        x + radius[3],
-    ]
-    y_origin = [
-        y + radius[0],
-        y + radius[1],
-        y + h - radius[2],
-        y + h - radius[3],
-    ]
-    angle_start = [
-        math.pi * 1.0,
-        math.pi * 1.5,
-        math.pi * 0.0,
-        math.pi * 0.5,
-    ]
+
+def draw_rounded_box(x, y, w, h, round_radius, fill=False,
+                     color=None, round_corner=None, line_thickness=1):
+    """round_corner: [Right Bottom, Left Bottom, Right Top, Left Top]"""
+
+    if color is None:
+        color = [1.0, 1.0, 1.0, 1.0]
+    if round_corner is None:
+        round_corner = [True, True, True, True]
+
+    template = rounded_box_geometry.get(round_radius, round_corner)
 
     original_state = gpu.state.blend_get()
     gpu.state.blend_set('ALPHA')
@@ -282,17 +429,10 @@ def draw_rounded_box(x, y, w, h, round_radius, fill=False,
 
     if fill:
         imm.immBegin(imm.GL_TRIANGLE_FAN)
+        imm.immVertexTemplate2f(template, x, y, w, h)
     else:
         imm.immBegin(imm.GL_LINE_LOOP)
-    for x0, y0, angle, r in zip(x_origin, y_origin, angle_start, radius):
-        for _ in range(n):
-            x = x0 + r * math.cos(angle)
-            y = y0 + r * math.sin(angle)
-            if not fill:
-                imm.immVertex3f(x, y, 0)
-            else:
-                imm.immVertex2f(x, y)
-            angle += dangle
+        imm.immVertexTemplate3f(template, x, y, w, h)
     imm.immEnd()
 
     imm.immLineWidth(1.0)
@@ -315,8 +455,8 @@ def draw_rect(x1, y1, x2, y2, color):
 
 def draw_text_background(text, font_id, x, y, background_color,
                          margin=0, round_radius=0):
-    width = blf.dimensions(font_id, text)[0]
-    height = blf.dimensions(font_id, "Hy|")[1]
+    width = text_metrics.dimensions(font_id, text)[0]
+    height = text_metrics.dimensions(font_id, "Hy|")[1]
     correction = height * 0.2
 
     if round_radius == 0:
@@ -330,6 +470,9 @@ def draw_text_background(text, font_id, x, y, background_color,
 
 
 def draw_text(text, font_id, color, shadow=False, shadow_color=None):
+    # Text must be drawn over the recorded primitives.
+    imm.immBatchFlush()
+
     blf.enable(font_id, blf.SHADOW)
 
     # Draw shadow.
@@ -340,6 +483,7 @@ def draw_text(text, font_id, color, shadow=False, shadow_color=None):
     # Draw text.
     blf.color(font_id, *color)
     blf.draw(font_id, text)
+    profiler.count("blf.draw")
 
     blf.disable(font_id, blf.SHADOW)
 
@@ -392,6 +536,44 @@ def get_window_region_rect(area):
     return rect
 
 
+class RegionRectOnV3DCache:
+    """Memo of the results of get_region_rect_on_v3d.
+
+    All results are discarded when the screen layout is changed.
+    A result is recalculated when the geometry of the area or the regions
+    which affect the result is changed. The geometry is read by the caller,
+    so no Area/Region is kept in the cache.
+    """
+
+    def __init__(self):
+        # Generation of the screen layout.
+        self.generation = None
+        # Format: {(Area.as_pointer(), Region.as_pointer(),
+        #           use_region_overlap): (geometry, rect)}
+        self.entries = {}
+
+    def clear(self):
+        self.generation = None
+        self.entries.clear()
+
+    def get(self, generation, key, geometry):
+        if generation != self.generation:
+            self.entries.clear()
+            self.generation = generation
+            return None
+
+        entry = self.entries.get(key)
+        if entry is None or entry[0] != geometry:
+            return None
+        return entry[1]
+
+    def set(self, key, geometry, rect):
+        self.entries[key] = (geometry, rect)
+
+
+region_rect_on_v3d_cache = RegionRectOnV3DCache()
+
+
 def get_region_rect_on_v3d(context, area=None, region=None):
     """On VIEW_3D, we need to handle region overlap.
        This function takes into accout this, and return rectangle.
@@ -409,6 +591,17 @@ def get_region_rect_on_v3d(context, area=None, region=None):
                 region.x + region.width, region.y + region.height]
 
     # From here, we handle 'WINDOW' region with considering region overlap.
+    use_region_overlap = context.preferences.system.use_region_overlap
+    key = (area.as_pointer(), region.as_pointer(), use_region_overlap)
+    # Geometry of the area and regions which affects the result.
+    geometry = ((area.x, area.y, area.width, area.height), ) + tuple(
+        (ar.type, ar.x, ar.y, ar.width, ar.height) for ar in area.regions
+        if ar.type in ('WINDOW', 'TOOLS', 'UI'))
+    generation = SK_OT_ScreencastKeys.screen_layout.generation
+    rect = region_rect_on_v3d_cache.get(generation, key, geometry)
+    if rect is not None:
+        return rect
+
     window = region
     tools = ui = None
     for ar in area.regions:
@@ -423,8 +616,7 @@ def get_region_rect_on_v3d(context, area=None, region=None):
                 ui = ar
 
     xmin, _, xmax, _ = get_window_region_rect(area)
-    sys_pref = context.preferences.system
-    if sys_pref.use_region_overlap:
+    if use_region_overlap:
         left_width = right_width = 0
 
         if tools and ui:
@@ -465,27 +657,173 @@ def get_region_rect_on_v3d(context, area=None, region=None):
     ymin = window.y
     ymax = window.y + window.height - 1
 
-    return xmin, ymin, xmax, ymax
+    rect = (xmin, ymin, xmax, ymax)
+    region_rect_on_v3d_cache.set(key, geometry, rect)
+
+    return rect
 
 
-def get_display_event_text(event_id):
-    user_prefs = bpy.context.preferences
-    prefs = user_prefs.addons[__package__].preferences
+class DisplayEventTextIndex:
+    """Index from event ID to the display text of the event.
 
-    if not prefs.enable_display_event_text_aliases:
-        if EventType[event_id] in SK_OT_ScreencastKeys.MODIFIER_EVENT_TYPES:
-            return fix_modifier_display_text(EventType.names[event_id])
+    The index is built from the preferences on the first lookup, and is
+    discarded when the display event text aliases are updated.
+    The joined display texts of all combinations of the modifier keys are
+    also held, so that the text of the modifier keys is looked up by the
+    bitmask over SK_OT_ScreencastKeys.MODIFIER_EVENT_TYPES.
+    """
+
+    def __init__(self):
+        # Format: {event_id: display_text}
+        self.index = None
+        # Format: [display_text, ...] (Indexed by the bitmask)
+        self.modifier_texts = None
+        # Incremented when the index is discarded, so that the texts built
+        # from the index can be checked if they are up to date.
+        self.generation = 0
+
+    def invalidate(self):
+        self.index = None
+        self.modifier_texts = None
+        self.generation += 1
+
+    def build(self):
+        user_prefs = bpy.context.preferences
+        prefs = user_prefs.addons[__package__].preferences
+
+        index = {}
+        if not prefs.enable_display_event_text_aliases:
+            for event_type in EventType:
+                if event_type in SK_OT_ScreencastKeys.MODIFIER_EVENT_TYPES:
+                    index[event_type.name] = fix_modifier_display_text(
+                        EventType.names[event_type.name])
+                else:
+                    index[event_type.name] = EventType.names[event_type.name]
         else:
-            return EventType.names[event_id]
+            for prop in prefs.display_event_text_aliases_props:
+                # First entry has priority if the entries are duplicated.
+                if prop.event_id in index:
+                    continue
+                if prop.alias_text == "":
+                    index[prop.event_id] = prop.default_text
+                else:
+                    index[prop.event_id] = prop.alias_text
 
-    for prop in prefs.display_event_text_aliases_props:
-        if prop.event_id == event_id:
-            if prop.alias_text == "":
-                return prop.default_text
-            else:
-                return prop.alias_text
+        self.index = index
+        return index
 
-    return "UNKNOWN"
+    def get(self, event_id):
+        index = self.index
+        if index is None:
+            index = self.build()
+        return index.get(event_id, "UNKNOWN")
+
+    def build_modifier_texts(self):
+        modifier_event_types = SK_OT_ScreencastKeys.MODIFIER_EVENT_TYPES
+
+        modifier_texts = []
+        for mask in range(1 << len(modifier_event_types)):
+            names = []
+            for i, event_type in enumerate(modifier_event_types):
+                if not mask & (1 << i):
+                    continue
+                name = self.get(event_type.name)
+                # Unique.
+                if name not in names:
+                    names.append(name)
+            modifier_texts.append(" + ".join(names))
+
+        self.modifier_texts = modifier_texts
+        return modifier_texts
+
+    def get_modifier_text(self, mask):
+        modifier_texts = self.modifier_texts
+        if modifier_texts is None:
+            modifier_texts = self.build_modifier_texts()
+        return modifier_texts[mask]
+
+
+display_event_text_index = DisplayEventTextIndex()
+
+
+def get_display_event_text(event_id):
+    return display_event_text_index.get(event_id)
+
+
+def get_modifier_display_text(mask):
+    return display_event_text_index.get_modifier_text(mask)
+
+
+def invalidate_display_event_text():
+    display_event_text_index.invalidate()
+
+
+class EventRecord:
+    """Entry of the event history.
+
+    Modifiers are held as a bitmask over
+    SK_OT_ScreencastKeys.MODIFIER_EVENT_TYPES. The display text is built on
+    the first request, and is rebuilt only when the repeat count is
+    incremented or the display event text aliases are updated.
+    The width of the display text is cached in the same way, and is also
+    measured again when the font size is changed.
+    """
+
+    __slots__ = (
+        "time",
+        "event_type",
+        "modifiers",
+        "repeat_count",
+        "text",
+        "text_generation",
+        "text_width",
+        "text_width_key",
+    )
+
+    def __init__(self, time_, event_type, modifiers):
+        self.time = time_
+        self.event_type = event_type
+        self.modifiers = modifiers
+        self.repeat_count = 1
+        self.text = None
+        self.text_generation = None
+        self.text_width = 0.0
+        self.text_width_key = None
+
+    def is_same(self, other):
+        return self.event_type == other.event_type and \
+            self.modifiers == other.modifiers
+
+    def repeat(self, time_):
+        self.time = time_
+        self.repeat_count += 1
+        self.text = None
+        self.text_width_key = None
+
+    def display_text(self):
+        generation = display_event_text_index.generation
+        if self.text is not None and self.text_generation == generation:
+            return self.text
+
+        text = get_display_event_text(self.event_type.name)
+        if self.modifiers:
+            text = "{} + {}".format(
+                get_modifier_display_text(self.modifiers), text)
+        if self.repeat_count > 1:
+            text += " x{}".format(self.repeat_count)
+
+        self.text = text
+        self.text_generation = generation
+        self.text_width_key = None
+        return text
+
+    def display_text_width(self, font_id):
+        text = self.display_text()
+        key = text_metrics.size_key(font_id)
+        if key != self.text_width_key:
+            self.text_width = text_metrics.dimensions(font_id, text)[0]
+            self.text_width_key = key
+        return self.text_width
 
 
 def show_mouse_hold_status(prefs):
@@ -514,6 +852,572 @@ def show_draw_area_background(prefs):
     return prefs.background_mode == 'DRAW_AREA'
 
 
+class PreferencesSnapshot:
+    """Immutable copy of the add-on preferences used by the draw and modal
+    code.
+
+    Reading a property through RNA is much slower than reading a Python
+    attribute, so the values are copied once and the copy is shared until
+    one of the preferences is updated.
+    """
+
+    __slots__ = (
+        "color", "shadow", "shadow_color", "background", "background_mode",
+        "background_color", "background_rounded_corner_radius", "font_size",
+        "margin", "line_thickness", "mouse_size", "origin", "offset",
+        "align", "display_time", "max_event_history", "repeat_count",
+        "show_mouse_events", "mouse_events_show_mode",
+        "use_custom_mouse_image", "custom_mouse_image_display_mode",
+        "custom_mouse_size", "show_last_operator", "last_operator_show_mode",
+        "get_event_aggressively", "auto_save", "use_offscreen_rendering",
+        "display_draw_area",
+        "use_mouse_hold_status", "use_mouse_event_history",
+        "use_text_background", "use_draw_area_background",
+        "overlay_values",
+    )
+
+    def __init__(self, prefs):
+        self.color = tuple(prefs.color)
+        self.shadow = prefs.shadow
+        self.shadow_color = tuple(prefs.shadow_color)
+        self.background = prefs.background
+        self.background_mode = prefs.background_mode
+        self.background_color = tuple(prefs.background_color)
+        # pylint: disable=C0103
+        self.background_rounded_corner_radius = \
+            prefs.background_rounded_corner_radius
+        self.font_size = prefs.font_size
+        self.margin = prefs.margin
+        self.line_thickness = prefs.line_thickness
+        self.mouse_size = prefs.mouse_size
+        self.origin = prefs.origin
+        self.offset = tuple(prefs.offset)
+        self.align = prefs.align
+        self.display_time = prefs.display_time
+        self.max_event_history = prefs.max_event_history
+        self.repeat_count = prefs.repeat_count
+        self.show_mouse_events = prefs.show_mouse_events
+        self.mouse_events_show_mode = prefs.mouse_events_show_mode
+        self.use_custom_mouse_image = prefs.use_custom_mouse_image
+        self.custom_mouse_image_display_mode = \
+            prefs.custom_mouse_image_display_mode
+        self.custom_mouse_size = tuple(prefs.custom_mouse_size)
+        self.show_last_operator = prefs.show_last_operator
+        self.last_operator_show_mode = prefs.last_operator_show_mode
+        self.get_event_aggressively = prefs.get_event_aggressively
+        self.auto_save = prefs.auto_save
+        self.use_offscreen_rendering = prefs.use_offscreen_rendering
+        self.display_draw_area = prefs.display_draw_area
+
+        self.use_mouse_hold_status = show_mouse_hold_status(prefs)
+        self.use_mouse_event_history = show_mouse_event_history(prefs)
+        self.use_text_background = show_text_background(prefs)
+        self.use_draw_area_background = show_draw_area_background(prefs)
+
+        # Values which affect the rendered overlay.
+        self.overlay_values = (
+            self.color, self.shadow, self.shadow_color, self.background,
+            self.background_mode, self.background_color,
+            self.background_rounded_corner_radius, self.font_size,
+            self.margin, self.line_thickness, self.mouse_size, self.align,
+            self.display_time, self.show_mouse_events,
+            self.mouse_events_show_mode, self.use_custom_mouse_image,
+            self.custom_mouse_image_display_mode, self.custom_mouse_size,
+            self.show_last_operator, self.last_operator_show_mode,
+            self.display_draw_area,
+        )
+
+    def __setattr__(self, name, value):
+        # Each value can be set only once in __init__.
+        if hasattr(self, name):
+            raise AttributeError(
+                "PreferencesSnapshot is immutable (name={})".format(name))
+        object.__setattr__(self, name, value)
+
+    def __delattr__(self, name):
+        raise AttributeError(
+            "PreferencesSnapshot is immutable (name={})".format(name))
+
+
+class PreferencesSnapshotCache:
+    """Hold the preferences snapshot until the preferences are updated."""
+
+    def __init__(self):
+        self.snapshot = None
+
+    def invalidate(self):
+        self.snapshot = None
+
+    def get(self):
+        snapshot = self.snapshot
+        if snapshot is None:
+            user_prefs = bpy.context.preferences
+            snapshot = PreferencesSnapshot(
+                user_prefs.addons[__package__].preferences)
+            self.snapshot = snapshot
+        return snapshot
+
+
+preferences_snapshot = PreferencesSnapshotCache()
+
+
+def get_preferences_snapshot():
+    return preferences_snapshot.get()
+
+
+def invalidate_preferences_snapshot():
+    preferences_snapshot.invalidate()
+
+
+class LayoutSnapshot:
+    """Layout of the draw area shared by all draw callbacks in a redraw tick.
+
+    The values are calculated lazily on the first access and are discarded
+    when SK_OT_ScreencastKeys.invalidate_layout is called.
+    When origin is 'CURSOR', the layout is kept over the redraw ticks until
+    the content is changed, and only the origin follows the mouse cursor.
+    """
+
+    def __init__(self, generation):
+        self.generation = generation
+        # (width, height)
+        self.draw_area_size = None
+        # (Window, Area, Region, x, y)
+        self.origin = None
+        # (xmin, ymin, xmax, ymax) or None
+        self.draw_area_rect = None
+        # Format: [(text, text_width), ...] (Newest event is first)
+        self.event_history_lines = None
+        # Format: {font_id: content fingerprint}
+        self.content_fingerprints = {}
+        # Offset of the draw area from the mouse cursor when origin is
+        # 'CURSOR'.
+        # Format: (Window, x, y)
+        self.cursor_anchor = None
+
+    def invalidate_origin(self):
+        self.origin = None
+        self.draw_area_rect = None
+
+
+class OperatorHistoryTracker:
+    """Find operators appended to WindowManager.operators incrementally.
+
+    Only the length and the last operator of the operator stack are
+    remembered, so the cost is proportional to the number of new operators.
+    """
+
+    def __init__(self):
+        # Length of the operator stack at the previous check.
+        self.length = 0
+        # Last operator (Operator.as_pointer()) at the previous check.
+        self.tail = None
+        # Format: {bl_idname: idname_py}
+        self.idname_py_cache = {}
+
+    def reset(self):
+        self.length = 0
+        self.tail = None
+
+    def idname_py(self, bl_idname):
+        """Convert bl_idname (ex. MESH_OT_extrude) to Python style
+           (ex. mesh.extrude)."""
+
+        idname_py = self.idname_py_cache.get(bl_idname)
+        if idname_py is None:
+            op_prefix, op_name = bl_idname.split("_OT_")
+            idname_py = "{}.{}".format(op_prefix.lower(), op_name)
+            self.idname_py_cache[bl_idname] = idname_py
+        return idname_py
+
+    def new_operators(self, operators):
+        """Return operators appended after the previous call."""
+
+        length = len(operators)
+        if length == 0:
+            self.reset()
+            return []
+
+        tail = operators[length - 1].as_pointer()
+        if length == self.length and tail == self.tail:
+            return []
+
+        start = 0
+        if self.tail is not None:
+            if 0 < self.length <= length and \
+                    operators[self.length - 1].as_pointer() == self.tail:
+                # Operators are just appended.
+                start = self.length
+            else:
+                # Old operators are removed from the head of the stack.
+                # Find the last operator detected at the previous call.
+                for i in range(length - 1, -1, -1):
+                    if operators[i].as_pointer() == self.tail:
+                        start = i + 1
+                        break
+
+        self.length = length
+        self.tail = tail
+
+        return [operators[i] for i in range(start, length)]
+
+
+class RegionGridIndex:
+    """Uniform grid of the region rectangles on the screen.
+
+    This finds regions overlapping with a rectangle without testing all
+    regions.
+    Only the pointers and the geometry are kept, and the found regions are
+    resolved from the screen when they are used.
+    """
+
+    CELL_SIZE = 256
+
+    def __init__(self, screen):
+        # Format: [(index of Screen.areas, index of Area.regions,
+        #           Area.as_pointer(), Region.as_pointer(),
+        #           (x, y, width, height)), ...]
+        self.entries = []
+        # Format: {(cell_x, cell_y): [index of self.entries, ...]}
+        self.cells = {}
+
+        for area_index, area in enumerate(screen.areas):
+            area_p = area.as_pointer()
+            for region_index, region in enumerate(area.regions):
+                if region.type == '':
+                    continue    # Skip region with no type.
+                geometry = (region.x, region.y, region.width, region.height)
+                index = len(self.entries)
+                self.entries.append((area_index, region_index, area_p,
+                                     region.as_pointer(), geometry))
+                for cell in self.cells_in_rect(self.region_rect(geometry)):
+                    self.cells.setdefault(cell, []).append(index)
+
+    @staticmethod
+    def region_rect(geometry):
+        x, y, width, height = geometry
+        return (x, y, x + width - 1, y + height - 1)
+
+    @classmethod
+    def cells_in_rect(cls, rect):
+        size = cls.CELL_SIZE
+        min_x, max_x = sorted((rect[0], rect[2]))
+        min_y, max_y = sorted((rect[1], rect[3]))
+        for cell_x in range(int(min_x // size), int(max_x // size) + 1):
+            for cell_y in range(int(min_y // size), int(max_y // size) + 1):
+                yield (cell_x, cell_y)
+
+    def find(self, screen, rects):
+        """Find regions overlapping with any of rects.
+           Return None if the found regions are not on the screen or their
+           geometry is changed.
+        """
+
+        indices = set()
+        for rect in rects:
+            for cell in self.cells_in_rect(rect):
+                indices.update(self.cells.get(cell, ()))
+
+        # Keep the order of the regions on the screen.
+        found = []
+        for index in sorted(indices):
+            entry = self.entries[index]
+            region_min_x, region_min_y, region_max_x, region_max_y = \
+                self.region_rect(entry[4])
+            for min_x, min_y, max_x, max_y in rects:
+                if intersect_aabb([region_min_x, region_min_y],
+                                  [region_max_x, region_max_y],
+                                  [min_x, min_y], [max_x, max_y]):
+                    found.append(entry)
+                    break
+
+        # Resolve the regions from the screen.
+        areas = screen.areas
+        regions = []
+        for area_index, region_index, area_p, region_p, geometry in found:
+            if area_index >= len(areas):
+                return None
+            area = areas[area_index]
+            if area.as_pointer() != area_p or \
+                    region_index >= len(area.regions):
+                return None
+            region = area.regions[region_index]
+            if region.as_pointer() != region_p or \
+                    geometry != (region.x, region.y, region.width,
+                                 region.height):
+                return None
+            regions.append((area, region))
+
+        return regions
+
+
+class ScreenLayoutCache:
+    """Data derived from the screen layout.
+
+    The cache is rebuilt only when the screen layout is changed.
+    A cheap check (screen and number of areas) is always performed, and
+    a full check (areas, their active spaces and the geometry of the areas
+    and the regions) is performed on request.
+    """
+
+    def __init__(self):
+        # Screen.as_pointer()
+        self.screen = None
+        # Format: ((Area.as_pointer(), Space.as_pointer() of active), ...)
+        self.areas = ()
+        # Format: ((x, y, width, height), ...)
+        self.area_geometry = ()
+        # Format: (((x, y, width, height), ...), ...) (Regions of each area)
+        self.region_geometry = ()
+        # Incremented when the layout is changed.
+        self.generation = 0
+        # Area - Space mapping.
+        # Format: {Area.as_pointer(): {Space.as_pointer(), ...}}
+        self.area_spaces = {}
+        # Spatial index of regions. Built on demand.
+        self.region_index = None
+
+    def clear(self):
+        self.screen = None
+        self.areas = ()
+        self.area_geometry = ()
+        self.region_geometry = ()
+        self.area_spaces.clear()
+        self.region_index = None
+        self.generation += 1
+
+    def find_regions(self, screen, rects):
+        """Find regions overlapping with any of rects.
+
+        rects is a list of (min_x, min_y, max_x, max_y) in the window
+        coordinate. Return [(Area, Region), ...].
+        """
+
+        if self.region_index is not None:
+            regions = self.region_index.find(screen, rects)
+            if regions is not None:
+                return regions
+
+        # Regions or their geometry are changed. Rebuild the index.
+        self.region_index = RegionGridIndex(screen)
+        return self.region_index.find(screen, rects)
+
+    def update(self, screen, full_check=True):
+        """Update the cache if the layout is changed.
+           Return True if the layout is changed.
+        """
+
+        areas = screen.areas
+        screen_changed = screen.as_pointer() != self.screen or \
+            len(areas) != len(self.areas)
+        if not screen_changed and not full_check:
+            return False
+
+        area_keys = tuple((area.as_pointer(), area.spaces.active.as_pointer())
+                          for area in areas)
+        area_geometry = tuple((area.x, area.y, area.width, area.height)
+                              for area in areas)
+        region_geometry = tuple(
+            tuple((region.x, region.y, region.width, region.height)
+                  for region in area.regions)
+            for area in areas)
+        if not screen_changed and area_keys == self.areas:
+            if area_geometry == self.area_geometry and \
+                    region_geometry == self.region_geometry:
+                return False
+            # Areas or regions (e.g. sidebar) are resized.
+            self.area_geometry = area_geometry
+            self.region_geometry = region_geometry
+            self.region_index = None
+            self.generation += 1
+            return True
+
+        # Add spaces of new areas and areas whose active space is changed.
+        # Spaces which are not active are kept because they may be activated
+        # again.
+        old_areas = set(self.areas)
+        for area, key in zip(areas, area_keys):
+            if key not in old_areas:
+                spaces = self.area_spaces.setdefault(key[0], set())
+                spaces.update(space.as_pointer() for space in area.spaces)
+
+        # Remove disappeared areas.
+        area_pointers = {key[0] for key in area_keys}
+        for area_p in list(self.area_spaces.keys()):
+            if area_p not in area_pointers:
+                del self.area_spaces[area_p]
+
+        self.screen = screen.as_pointer()
+        self.areas = area_keys
+        self.area_geometry = area_geometry
+        self.region_geometry = region_geometry
+        self.region_index = None
+        self.generation += 1
+
+        return True
+
+
+class RedrawScheduler:
+    """Remember the overlay drawn at the last redraw to find changes."""
+
+    def __init__(self):
+        # Draw area in the window coordinate. None if nothing is drawn.
+        self.rect = None
+        # Fingerprint of the content.
+        self.fingerprint = None
+        self.valid = False
+
+    def clear(self):
+        self.rect = None
+        self.fingerprint = None
+        self.valid = False
+
+    def invalidate(self):
+        """Treat the next update as changed."""
+
+        self.valid = False
+
+    def update(self, rect, fingerprint):
+        """Update the last drawn overlay.
+           Return True if the overlay is changed.
+        """
+
+        rect = tuple(rect) if rect else None
+        if self.valid and rect == self.rect and \
+                fingerprint == self.fingerprint:
+            return False
+
+        self.rect = rect
+        self.fingerprint = fingerprint
+        self.valid = True
+
+        return True
+
+
+class OverlayOffScreen:
+    """Offscreen buffer holding the rendered overlay.
+
+    The overlay is rendered only when the fingerprint of the content is
+    changed, and the rendered texture is drawn into each region.
+    The fingerprint is relative to the draw area, so the moved overlay is
+    drawn by translating the rendered texture.
+    """
+
+    # The offscreen buffer is allocated with this granularity to avoid
+    # reallocating on every change of the draw area size.
+    SIZE_GRANULARITY = 64
+
+    def __init__(self):
+        self.offscreen = None
+        # Format: (width, height)
+        self.buffer_size = None
+        # Rendered area in the window coordinate.
+        # Format: (x, y, width, height)
+        self.rect = None
+        self.fingerprint = None
+        # False if the offscreen buffer is not available on this environment.
+        self.supported = hasattr(gpu, "types") and \
+            hasattr(gpu.types, "GPUOffScreen") and \
+            hasattr(gpu.state, "active_framebuffer_get")
+
+    def free(self):
+        if self.offscreen is not None:
+            self.offscreen.free()
+        self.offscreen = None
+        self.buffer_size = None
+        self.rect = None
+        self.fingerprint = None
+
+    def render(self, draw_area_rect, fingerprint, draw_fn):
+        """Render the overlay by draw_fn(base_x, base_y) if needed.
+
+        Return False if the offscreen buffer is not available.
+        """
+
+        if not self.supported:
+            return False
+
+        min_x = math.floor(draw_area_rect[0])
+        min_y = math.floor(draw_area_rect[1])
+        width = max(math.ceil(draw_area_rect[2]) - min_x, 1)
+        height = max(math.ceil(draw_area_rect[3]) - min_y, 1)
+        rect = (min_x, min_y, width, height)
+        if self.offscreen is not None and fingerprint == self.fingerprint:
+            # Same size and content. Only the position may be changed.
+            self.rect = rect
+            return True
+
+        if self.offscreen is None or width > self.buffer_size[0] or \
+                height > self.buffer_size[1]:
+            self.free()
+            granularity = self.SIZE_GRANULARITY
+            buffer_size = (math.ceil(width / granularity) * granularity,
+                           math.ceil(height / granularity) * granularity)
+            try:
+                self.offscreen = gpu.types.GPUOffScreen(*buffer_size)
+            except RuntimeError as e:
+                debug_print(f"Failed to create offscreen buffer: {e}")
+                self.supported = False
+                return False
+            self.buffer_size = buffer_size
+        self.rect = rect
+        self.fingerprint = fingerprint
+        buffer_width, buffer_height = self.buffer_size
+
+        with self.offscreen.bind():
+            framebuffer = gpu.state.active_framebuffer_get()
+            framebuffer.clear(color=(0.0, 0.0, 0.0, 0.0))
+            with gpu.matrix.push_pop(), gpu.matrix.push_pop_projection():
+                gpu.matrix.load_identity()
+                gpu.matrix.load_projection_matrix(Matrix.Identity(4))
+                gpu.matrix.translate((-1.0, -1.0))
+                gpu.matrix.scale((2.0 / buffer_width, 2.0 / buffer_height))
+                imm.immSetViewportSize([buffer_width, buffer_height])
+                try:
+                    draw_fn(min_x, min_y)
+                finally:
+                    imm.immSetViewportSize(None)
+
+        return True
+
+    def draw(self, base_x, base_y):
+        """Draw the rendered overlay.
+
+        (base_x, base_y) is the position of the draw target in the window
+        coordinate.
+        """
+
+        x = self.rect[0] - base_x
+        y = self.rect[1] - base_y
+        w = self.rect[2]
+        h = self.rect[3]
+        u = w / self.buffer_size[0]
+        v = h / self.buffer_size[1]
+
+        # The offscreen buffer holds the colors multiplied by alpha.
+        original_state = gpu.state.blend_get()
+        gpu.state.blend_set('ALPHA_PREMULT')
+
+        imm.immSetTexture(self.offscreen.texture_color)
+        imm.immBegin(imm.GL_QUADS)
+        imm.immColor4f(1.0, 1.0, 1.0, 1.0)
+        for (v1, v2), (t1, t2) in zip(
+                [[x, y], [x, y + h], [x + w, y + h], [x + w, y]],
+                [[0.0, 0.0], [0.0, v], [u, v], [u, 0.0]]):
+            imm.immTexCoord2f(t1, t2)
+            imm.immVertex2f(v1, v2)
+        imm.immEnd()
+        imm.immSetTexture(None)
+
+        gpu.state.blend_set(original_state)
+
+
+def region_trace_args(_, context):
+    """Return the arguments of the span for the draw callback."""
+
+    return {"area": context.area.type, "region": context.region.type}
+
+
 @BlClassRegistry()
 class SK_OT_ScreencastKeys(bpy.types.Operator):
     # pylint: disable=R0904
@@ -530,6 +1434,9 @@ class SK_OT_ScreencastKeys(bpy.types.Operator):
 
     # Hold modifier keys.
     hold_modifier_keys = []
+    # Modifier flags (shift, oskey, alt, ctrl) of the last processed event.
+    # None if the hold modifier keys must be updated by the next event.
+    event_modifier_state = None
     # Hold mouse buttons.
     mouse_buttons_status = {
         'LEFTMOUSE': 'RELEASE',    # One of ['RELEASE', 'PRESS', 'CLICK_DRAG']
@@ -544,11 +1451,16 @@ class SK_OT_ScreencastKeys(bpy.types.Operator):
     }
 
     # Event history.
-    # Format: [time, event_type, modifiers, repeat_count]
-    event_history = []
+    # Bounded by Preferences.max_event_history. Events are ordered by time,
+    # so expired events are always popped from the head.
+    # Format: deque([EventRecord, ...])
+    event_history = collections.deque()
     # Operator history.
-    # Format: [time, bl_label, idname_py, addr]
-    operator_history = []
+    # TODO: Control number of history from Preferences.
+    # Format: deque([[time, bl_label, idname_py, addr], ...])
+    operator_history = collections.deque(maxlen=32)
+    # Tracker of WindowManager.operators.
+    operator_tracker = OperatorHistoryTracker()
 
     MODIFIER_EVENT_TYPES = [
         EventType.LEFT_SHIFT,
@@ -560,6 +1472,11 @@ class SK_OT_ScreencastKeys(bpy.types.Operator):
         EventType.OSKEY
     ]
 
+    # Format: {event_type: bit}
+    MODIFIER_EVENT_BITS = {
+        event_type: 1 << i for i, event_type in enumerate(MODIFIER_EVENT_TYPES)
+    }
+
     MOUSE_EVENT_TYPES = {
         EventType.LEFTMOUSE,
         EventType.MIDDLEMOUSE,
@@ -577,6 +1494,42 @@ class SK_OT_ScreencastKeys(bpy.types.Operator):
         EventType.WHEELOUTMOUSE,
     }
 
+    # Events which arrive at the input device rate and only move the mouse
+    # cursor. They have no 'PRESS' value, so they are never shown in the
+    # event history.
+    POINTER_EVENT_TYPES = {
+        'MOUSEMOVE',
+        'INBETWEEN_MOUSEMOVE',
+        'TRACKPADPAN',
+        'TRACKPADZOOM',
+        'MOUSEROTATE',
+        'MOUSESMARTZOOM',
+    }
+
+    # Events which are never shown in the event history.
+    # 'EVT_TWEAK_*' and 'TIMER*' events are also ignored.
+    IGNORE_EVENT_TYPES = {
+        EventType.NONE,
+        EventType.MOUSEMOVE,
+        EventType.INBETWEEN_MOUSEMOVE,
+        EventType.WINDOW_DEACTIVATE,
+        EventType.TEXTINPUT,
+    }
+
+    # Classification of the events, which is looked up once per event.
+    # Format: {Event.type: (EventType, flags)}
+    EVENT_CLASSES = classify_event_types(
+        IGNORE_EVENT_TYPES, MOUSE_EVENT_TYPES, MODIFIER_EVENT_TYPES,
+        POINTER_EVENT_TYPES)
+
+    # Events whose bursts are coalesced into one event history entry.
+    COALESCED_EVENT_TYPES = {
+        EventType.WHEELUPMOUSE,
+        EventType.WHEELDOWNMOUSE,
+        EventType.WHEELINMOUSE,
+        EventType.WHEELOUTMOUSE,
+    }
+
     SPACE_TYPES = compat.get_all_space_types()
 
     # Height ratio for separator (against text height).
@@ -598,26 +1551,37 @@ class SK_OT_ScreencastKeys(bpy.types.Operator):
     DRAW_AREA_MARGIN_TOP = 15
     DRAW_AREA_MARGIN_BOTTOM = 15
 
-    # Interval for 'TIMER' event (redraw).
+    # Minimum interval for 'TIMER' event and redraw by the ignored events.
     TIMER_STEP = 0.1
 
+    # Delay of 'TIMER' event from the expiry time to make sure the expired
+    # contents are removed.
+    TIMER_DELAY = 0.01
+
     # Maximum interval for ignoring same event.
     INTERVAL_FOR_IGNORE_EVENT = 0.05
 
+    # Interval to redraw the panels which show the profile.
+    PROFILER_PANEL_REDRAW_INTERVAL = 1.0
+
     # Previous redraw time.
     prev_time = 0.0
 
+    # Previous redraw time of the panels which show the profile.
+    profiler_panel_redraw_time = 0.0
+
     # Timer handlers.
     # Format: {Window.as_pointer(): Timer}
     timers = {}
+    # Expiry time which the timers are armed for. None if no timers.
+    timer_deadline = None
 
     # Draw handlers.
     # Format: {(Space, Region.type): handle}
     handlers = {}
 
-    # Regions which are drawing in previous redraw.
-    # Format: {Region.as_pointer()}
-    draw_regions_prev = set()
+    # Decide regions to redraw.
+    redraw_scheduler = RedrawScheduler()
 
     # Draw target.
     origin = {
@@ -627,10 +1591,8 @@ class SK_OT_ScreencastKeys(bpy.types.Operator):
         "region_type": "",  # Region.type
     }
 
-    # Area - Space mapping.
-    # Format: {Area.as_pointer(), [Space.as_pointer(), ...]}
-    # TODO: Clear when this model is finished.
-    area_spaces = collections.defaultdict(set)
+    # Screen layout (Area - Space mapping, ...).
+    screen_layout = ScreenLayoutCache()
 
     # Check if this operator is running.
     # TODO: We can check it with the valid of event handler.
@@ -644,71 +1606,107 @@ class SK_OT_ScreencastKeys(bpy.types.Operator):
     # Current mouse coordinate.
     current_mouse_co = [0.0, 0.0]
 
+    # Rendered overlay for the offscreen rendering.
+    overlay_offscreen = OverlayOffScreen()
+
+    # Layout of the draw area for the current redraw tick.
+    layout_snapshot = None
+    # Generation of the layout. Incremented when the layout is invalidated.
+    layout_generation = 0
+    # Content stamp when the layout is invalidated at the last redraw tick.
+    layout_content_stamp = None
+
     @classmethod
     def is_running(cls):
         return cls.running
 
     @classmethod
-    def is_modifier_event(cls, event):
-        """Return True if event came from modifier key."""
+    def invalidate_layout(cls):
+        """Discard the layout calculated in the previous redraw tick."""
 
-        event_type = EventType[event.type]
-        return event_type in cls.MODIFIER_EVENT_TYPES
+        cls.layout_generation += 1
 
     @classmethod
-    def sorted_modifier_keys(cls, modifiers):
-        """Sort and unique modifier keys."""
+    def content_stamp(cls, user_prefs):
+        """Return the values which are changed when the content of the
+        overlay may be changed.
 
-        def key_fn(event_type):
-            if event_type in cls.MODIFIER_EVENT_TYPES:
-                return cls.MODIFIER_EVENT_TYPES.index(event_type)
-            else:
-                return 100
+        Unlike content_fingerprint, this is compared in O(1) at each redraw
+        tick. The contents which expire are not included because the redraw
+        tick at the expiry time invalidates the layout.
+        """
+
+        system = user_prefs.system
+        event_history = cls.event_history
+        operator_history = cls.operator_history
+        return (
+            preferences_snapshot.snapshot,
+            system.ui_scale,
+            system.dpi,
+            common.custom_mouse_textures_generation,
+            display_event_text_index.generation,
+            len(event_history),
+            event_history[0] if event_history else None,
+            event_history[-1] if event_history else None,
+            event_history[-1].repeat_count if event_history else 0,
+            operator_history[-1][3] if operator_history else None,
+            tuple(cls.hold_modifier_keys),
+            tuple(cls.mouse_buttons_status.values()),
+        )
+
+    @classmethod
+    def get_layout_snapshot(cls):
+        snapshot = cls.layout_snapshot
+        if snapshot is None or snapshot.generation != cls.layout_generation:
+            snapshot = LayoutSnapshot(cls.layout_generation)
+            cls.layout_snapshot = snapshot
+        return snapshot
 
-        modifiers = sorted(modifiers, key=key_fn)
-        names = []
-        for mod in modifiers:
-            name = get_display_event_text(mod.name)
-            assert mod in cls.MODIFIER_EVENT_TYPES, \
-                "{} must be modifier types".format(name)
+    @staticmethod
+    def is_modifier_event(flags):
+        """Return True if event came from modifier key."""
 
-            # Unique.
-            if name not in names:
-                names.append(name)
+        return bool(flags & EVENT_FLAG_MODIFIER)
+
+    @classmethod
+    def modifier_mask(cls, modifiers):
+        """Convert modifier keys to the bitmask."""
 
-        return names
+        mask = 0
+        for event_type in modifiers:
+            mask |= cls.MODIFIER_EVENT_BITS[event_type]
+        return mask
 
     @classmethod
-    def removed_old_event_history(cls):
-        """Return event history whose old events are removed."""
+    def prune_event_history(cls, prefs=None):
+        """Remove old events from event history and return it.
+           Returned value is the live event history, not a copy.
+        """
 
-        user_prefs = bpy.context.preferences
-        prefs = user_prefs.addons[__package__].preferences
-        current_time = time.time()
+        if prefs is None:
+            prefs = get_preferences_snapshot()
 
-        event_history = []
-        for item in cls.event_history:
-            event_time = item[0]
-            t = current_time - event_time
-            if t <= prefs.display_time:
-                event_history.append(item)
+        event_history = cls.event_history
+        if event_history.maxlen != prefs.max_event_history:
+            event_history = collections.deque(
+                event_history, maxlen=prefs.max_event_history)
+            cls.event_history = event_history
 
-        if len(event_history) >= prefs.max_event_history:
-            event_history = event_history[-prefs.max_event_history:]
+        expire_time = time.time() - prefs.display_time
+        while event_history and event_history[0].time < expire_time:
+            event_history.popleft()
 
         return event_history
 
     @classmethod
     def removed_old_operator_history(cls):
         """Return operator history whose old operators are removed."""
-        # TODO: Control number of history from Preferences.
 
-        return cls.operator_history[-32:]
+        return cls.operator_history
 
     @classmethod
     def get_alignment_offset(cls, context, width, margin=0):
-        user_prefs = context.preferences
-        prefs = user_prefs.addons[__package__].preferences
+        prefs = get_preferences_snapshot()
 
         dw, _ = cls.draw_area_size(context)
         dw -= cls.DRAW_AREA_MARGIN_LEFT + cls.DRAW_AREA_MARGIN_RIGHT
@@ -726,7 +1724,7 @@ class SK_OT_ScreencastKeys(bpy.types.Operator):
 
     @classmethod
     def get_text_offset_for_alignment(cls, context, font_id, text, margin=0):
-        tw = blf.dimensions(font_id, text)[0]
+        tw = text_metrics.dimensions(font_id, text)[0]
 
         return cls.get_alignment_offset(context, tw, margin)
 
@@ -736,8 +1734,48 @@ class SK_OT_ScreencastKeys(bpy.types.Operator):
            Retrun value: (Window, Area, Region, x, y)
         """
 
+        snapshot = cls.get_layout_snapshot()
+        if snapshot.origin is None:
+            snapshot.origin = cls._calc_origin(context)
+        return snapshot.origin
+
+    @classmethod
+    def _calc_cursor_origin(cls, context):
+        """Get draw target which follows the mouse cursor.
+
+        The offset from the mouse cursor is kept while the layout is valid,
+        so the mouse motion only translates the draw area.
+        """
+
+        snapshot = cls.get_layout_snapshot()
+        if snapshot.cursor_anchor is None:
+            user_prefs = context.preferences
+            prefs = get_preferences_snapshot()
+            ui_scale = user_prefs.system.ui_scale
+
+            for window in context.window_manager.windows:
+                if window.as_pointer() == cls.origin["window"]:
+                    break
+            else:
+                return None, None, None, 0, 0
+
+            draw_area_width, draw_area_height = cls.draw_area_size(context)
+            snapshot.cursor_anchor = (
+                window,
+                prefs.offset[0] * ui_scale - draw_area_width / 2,
+                prefs.offset[1] * ui_scale - draw_area_height)
+
+        window, x, y = snapshot.cursor_anchor
+        return (window, None, None,
+                x + cls.current_mouse_co[0], y + cls.current_mouse_co[1])
+
+    @classmethod
+    def _calc_origin(cls, context):
         user_prefs = context.preferences
-        prefs = user_prefs.addons[__package__].preferences
+        prefs = get_preferences_snapshot()
+        if prefs.origin == 'CURSOR':
+            return cls._calc_cursor_origin(context)
+
         ui_scale = user_prefs.system.ui_scale
         offset = [prefs.offset[0] * ui_scale, prefs.offset[1] * ui_scale]
 
@@ -753,7 +1791,7 @@ class SK_OT_ScreencastKeys(bpy.types.Operator):
                 return True
             else:
                 area_p = area.as_pointer()
-                if area_p in cls.area_spaces:
+                if area_p in cls.screen_layout.area_spaces:
                     spaces_p = {s.as_pointer() for s in area.spaces}
                     if cls.origin["space"] in spaces_p:
                         # Exists in inactive space information.
@@ -771,12 +1809,9 @@ class SK_OT_ScreencastKeys(bpy.types.Operator):
             return None, None, None, 0, 0
 
         # Calculate draw offset
-        draw_area_width, draw_area_height = cls.draw_area_size(context)
+        draw_area_width, _ = cls.draw_area_size(context)
         if prefs.align == 'LEFT':
             x, y = offset
-            if prefs.origin == 'CURSOR':
-                x += cls.current_mouse_co[0] - draw_area_width / 2
-                y += cls.current_mouse_co[1] - draw_area_height
         elif prefs.align == 'CENTER':
             x, y = offset
             if prefs.origin == 'WINDOW':
@@ -804,9 +1839,6 @@ class SK_OT_ScreencastKeys(bpy.types.Operator):
                             x += (region.width - draw_area_width) / 2
                         found = True
                         break
-            elif prefs.origin == 'CURSOR':
-                x += cls.current_mouse_co[0] - draw_area_width / 2
-                y += cls.current_mouse_co[1] - draw_area_height
         elif prefs.align == 'RIGHT':
             x, y = offset
             if prefs.origin == 'WINDOW':
@@ -834,11 +1866,8 @@ class SK_OT_ScreencastKeys(bpy.types.Operator):
                             x += region.width - draw_area_width
                         found = True
                         break
-            elif prefs.origin == 'CURSOR':
-                x += cls.current_mouse_co[0] - draw_area_width / 2
-                y += cls.current_mouse_co[1] - draw_area_height
 
-        if prefs.origin in ('WINDOW', 'CURSOR'):
+        if prefs.origin == 'WINDOW':
             return window, None, None, x, y
         elif prefs.origin == 'AREA':
             for area in window.screen.areas:
@@ -864,16 +1893,16 @@ class SK_OT_ScreencastKeys(bpy.types.Operator):
 
     @classmethod
     def text_area_width(cls, text, font_id):
-        return blf.dimensions(font_id, text)[0]
+        return text_metrics.dimensions(font_id, text)[0]
 
     @classmethod
     def text_area_height(cls, font_id):
-        return blf.dimensions(font_id, "Hy|")[1]
+        return text_metrics.dimensions(font_id, "Hy|")[1]
 
     @classmethod
     def _area_size_last_operator_layer(cls, context, font_id):
         user_prefs = context.preferences
-        prefs = user_prefs.addons[__package__].preferences
+        prefs = get_preferences_snapshot()
         ui_scale = user_prefs.system.ui_scale
         margin = prefs.margin * ui_scale
 
@@ -911,7 +1940,7 @@ class SK_OT_ScreencastKeys(bpy.types.Operator):
     @classmethod
     def _area_size_mouse_and_modifier_keys_layer(cls, context, font_id):
         user_prefs = context.preferences
-        prefs = user_prefs.addons[__package__].preferences
+        prefs = get_preferences_snapshot()
         ui_scale = user_prefs.system.ui_scale
         margin = prefs.margin * ui_scale
 
@@ -922,18 +1951,18 @@ class SK_OT_ScreencastKeys(bpy.types.Operator):
         # Setup hold modifier keys text
         modifier_keys_text = ""
         if cls.hold_modifier_keys or drawing:
-            mod_keys = cls.sorted_modifier_keys(cls.hold_modifier_keys)
+            mod_mask = cls.modifier_mask(cls.hold_modifier_keys)
             if drawing:
                 modifier_keys_text = ""
             else:
-                modifier_keys_text = " + ".join(mod_keys)
+                modifier_keys_text = get_modifier_display_text(mod_mask)
 
         mouse_width = 0.0
         mouse_height = 0.0
         hold_modifier_keys_width = 0.0
         hold_modifier_keys_height = 0.0
         separator_width = 0.0
-        if show_mouse_hold_status(prefs):
+        if prefs.use_mouse_hold_status:
             if prefs.use_custom_mouse_image:
                 mouse_width = prefs.custom_mouse_size[0]
                 mouse_height = prefs.custom_mouse_size[1]
@@ -955,7 +1984,7 @@ class SK_OT_ScreencastKeys(bpy.types.Operator):
                 hold_modifier_keys_width, prefs.font_size * 8)
             separator_width = \
                 mouse_width * cls.WIDTH_RATIO_FOR_SEPARATOR * ui_scale + margin
-        if show_mouse_hold_status(prefs) and cls.hold_modifier_keys:
+        if prefs.use_mouse_hold_status and cls.hold_modifier_keys:
             separator_width = \
                 mouse_width * cls.WIDTH_RATIO_FOR_SEPARATOR * ui_scale + margin
 
@@ -969,7 +1998,7 @@ class SK_OT_ScreencastKeys(bpy.types.Operator):
     @classmethod
     def _area_size_event_history_layer(cls, context, font_id):
         user_prefs = context.preferences
-        prefs = user_prefs.addons[__package__].preferences
+        prefs = get_preferences_snapshot()
         ui_scale = user_prefs.system.ui_scale
         margin = prefs.margin * ui_scale
 
@@ -978,29 +2007,39 @@ class SK_OT_ScreencastKeys(bpy.types.Operator):
         layer_width = 0.0
         layer_height = 0.0
 
-        event_history = cls.removed_old_event_history()
-        if event_history:
+        event_history_lines = cls.event_history_lines(font_id)
+        if event_history_lines:
             layer_height += cls.text_area_height(font_id) * \
                 cls.HEIGHT_RATIO_FOR_SEPARATOR
-        for _, event_type, modifiers, repeat_count in event_history[::-1]:
-            text = get_display_event_text(event_type.name)
-            if modifiers:
-                mod_keys = cls.sorted_modifier_keys(modifiers)
-                text = "{} + {}".format(" + ".join(mod_keys), text)
-            if repeat_count > 1:
-                text += " x{}".format(repeat_count)
-
-            text_width = cls.text_area_width(text, font_id) + margin * 2
-            layer_width = max(text_width, layer_width)
+        for _, text_width in event_history_lines:
+            layer_width = max(text_width + margin * 2, layer_width)
             layer_height += sh
 
         return layer_width, layer_height
 
     @classmethod
-    def skip_draw(cls, context):
+    def event_history_lines(cls, font_id):
+        """Return texts and widths of event history to display.
+           Retrun value: [(text, text_width), ...] (Newest event is first)
+        """
+
+        snapshot = cls.get_layout_snapshot()
+        if snapshot.event_history_lines is not None:
+            return snapshot.event_history_lines
+
+        lines = []
+        event_history = cls.prune_event_history()
+        for record in reversed(event_history):
+            lines.append((record.display_text(),
+                          record.display_text_width(font_id)))
+        snapshot.event_history_lines = lines
+
+        return lines
+
+    @classmethod
+    def skip_draw(cls, context):    # pylint: disable=W0613
         """Return True if no contents will be displayed."""
-        user_prefs = context.preferences
-        prefs = user_prefs.addons[__package__].preferences
+        prefs = get_preferences_snapshot()
 
         if prefs.show_last_operator:
             operator_history = cls.removed_old_operator_history()
@@ -1010,14 +2049,13 @@ class SK_OT_ScreencastKeys(bpy.types.Operator):
                 if current_time - time_ <= prefs.display_time:
                     return False
 
-        if show_mouse_hold_status(prefs):
+        if prefs.use_mouse_hold_status:
             return False
 
         if cls.hold_modifier_keys:
             return False
 
-        event_history = cls.removed_old_event_history()
-        if event_history:
+        if cls.prune_event_history(prefs):
             return False
 
         return True
@@ -1025,7 +2063,7 @@ class SK_OT_ScreencastKeys(bpy.types.Operator):
     @classmethod
     def draw_area_baseline(cls, context):
         user_prefs = context.preferences
-        prefs = user_prefs.addons[__package__].preferences
+        prefs = get_preferences_snapshot()
         ui_scale = user_prefs.system.ui_scale
         margin = prefs.margin * ui_scale
 
@@ -1073,13 +2111,21 @@ class SK_OT_ScreencastKeys(bpy.types.Operator):
                  --------------     --------------
         """
 
+        snapshot = cls.get_layout_snapshot()
+        if snapshot.draw_area_size is None:
+            snapshot.draw_area_size = cls._calc_draw_area_size(context)
+        return snapshot.draw_area_size
+
+    @classmethod
+    def _calc_draw_area_size(cls, context):
         user_prefs = context.preferences
-        prefs = user_prefs.addons[__package__].preferences
+        prefs = get_preferences_snapshot()
 
         font_size = prefs.font_size
         font_id = 0         # TODO: font_id should be constant.
         dpi = user_prefs.system.dpi
-        compat.blf_size(font_id, font_size, dpi)
+        ui_scale = user_prefs.system.ui_scale
+        text_metrics.set_size(font_id, font_size, dpi, ui_scale)
 
         # Calculate width/height of draw area.
         draw_area_width = 0
@@ -1112,8 +2158,14 @@ class SK_OT_ScreencastKeys(bpy.types.Operator):
     def draw_area_rect(cls, context):
         """Return draw area rectangle."""
 
-        user_prefs = context.preferences
-        prefs = user_prefs.addons[__package__].preferences
+        snapshot = cls.get_layout_snapshot()
+        if snapshot.draw_area_rect is None:
+            snapshot.draw_area_rect = cls._calc_draw_area_rect(context)
+        return snapshot.draw_area_rect
+
+    @classmethod
+    def _calc_draw_area_rect(cls, context):
+        prefs = get_preferences_snapshot()
 
         # Get draw target.
         window, area, region, x, y = cls.get_origin(context)
@@ -1151,42 +2203,44 @@ class SK_OT_ScreencastKeys(bpy.types.Operator):
         return None
 
     @classmethod
+    @profiler.timed("find_redraw_regions")
     def find_redraw_regions(cls, context):
-        """Find regions to redraw."""
-
-        rect = cls.draw_area_rect(context)
-        if not rect:
-            return []       # No draw target.
-
-        draw_area_min_x, draw_area_min_y, draw_area_max_x, draw_area_max_y = \
-            rect
-        width = draw_area_max_x - draw_area_min_x
-        height = draw_area_max_y - draw_area_min_y
-        if width == height == 0:
-            return []       # Zero size region.
+        """Find regions to redraw.
 
-        draw_area_min = [draw_area_min_x, draw_area_min_y]
-        draw_area_max = [draw_area_max_x - 1, draw_area_max_y - 1]
+        Only regions under the overlay drawn at the previous time or drawn
+        at this time are returned, and no regions are returned if neither
+        the draw area nor the content is changed.
+        """
 
-        # Collect regions which overlaps with draw area.
-        regions = []
-        for area in context.screen.areas:
-            for region in area.regions:
-                if region.type == '':
-                    continue    # Skip region with no type.
-                region_min = [region.x, region.y]
-                region_max = [region.x + region.width - 1,
-                              region.y + region.height - 1]
-                if intersect_aabb(region_min, region_max,
-                                  draw_area_min, draw_area_max):
-                    regions.append((area, region))
+        rect = None
+        fingerprint = None
+        if not cls.skip_draw(context):
+            rect = cls.draw_area_rect(context)
+            if rect and (rect[2] - rect[0] == rect[3] - rect[1] == 0):
+                rect = None     # Zero size region.
+            if rect:
+                fingerprint = cls.content_fingerprint(context, 0)
+
+        prev_rect = cls.redraw_scheduler.rect
+        if not cls.redraw_scheduler.update(rect, fingerprint):
+            return []       # Nothing is changed.
+
+        draw_rects = []
+        for r in (prev_rect, rect):
+            if r:
+                draw_rects.append((r[0], r[1], r[2] - 1, r[3] - 1))
+        if not draw_rects:
+            return []       # No draw target.
 
-        return regions
+        # Collect regions which overlaps with the previous or current draw
+        # area.
+        return cls.screen_layout.find_regions(context.screen, draw_rects)
 
     @classmethod
+    @profiler.timed("draw_last_operator_layer")
     def _draw_last_operator_layer(cls, context, font_id, x, y):
         user_prefs = context.preferences
-        prefs = user_prefs.addons[__package__].preferences
+        prefs = get_preferences_snapshot()
         ui_scale = user_prefs.system.ui_scale
         ui_line_width = user_prefs.system.ui_line_width
         margin = prefs.margin * ui_scale
@@ -1226,7 +2280,8 @@ class SK_OT_ScreencastKeys(bpy.types.Operator):
         operator_height = sh + sh * cls.HEIGHT_RATIO_FOR_SEPARATOR * 0.2
         separator_start_x = operator_start_x
         separator_start_y = operator_start_y + operator_height
-        separator_line_width = blf.dimensions(font_id, "Left Mouse")[0]
+        separator_line_width = \
+            text_metrics.dimensions(font_id, "Left Mouse")[0]
         separator_width = separator_line_width + margin * 2
         separator_height = sh * cls.HEIGHT_RATIO_FOR_SEPARATOR * 0.8
 
@@ -1244,7 +2299,7 @@ class SK_OT_ScreencastKeys(bpy.types.Operator):
 
         # Draw operator history.
         blf.position(font_id, operator_start_x, operator_start_y, 0)
-        if show_text_background(prefs):
+        if prefs.use_text_background:
             draw_text_background(operator_text, font_id,
                                  operator_start_x,
                                  operator_start_y,
@@ -1263,9 +2318,10 @@ class SK_OT_ScreencastKeys(bpy.types.Operator):
         return layer_width, layer_height, True
 
     @classmethod
+    @profiler.timed("draw_mouse_and_modifier_keys_layer")
     def _draw_mouse_and_modifier_keys_layer(cls, context, font_id, x, y):
         user_prefs = context.preferences
-        prefs = user_prefs.addons[__package__].preferences
+        prefs = get_preferences_snapshot()
         ui_scale = user_prefs.system.ui_scale
         ui_line_width = user_prefs.system.ui_line_width
         margin = prefs.margin * ui_scale
@@ -1279,11 +2335,11 @@ class SK_OT_ScreencastKeys(bpy.types.Operator):
         # Setup hold modifier keys text
         modifier_keys_text = ""
         if cls.hold_modifier_keys or drawing:
-            mod_keys = cls.sorted_modifier_keys(cls.hold_modifier_keys)
+            mod_mask = cls.modifier_mask(cls.hold_modifier_keys)
             if drawing:
                 modifier_keys_text = ""
             else:
-                modifier_keys_text = " + ".join(mod_keys)
+                modifier_keys_text = get_modifier_display_text(mod_mask)
 
         # Setup draw target position
         mouse_start_x = 0.0
@@ -1297,7 +2353,7 @@ class SK_OT_ScreencastKeys(bpy.types.Operator):
         hold_modifier_keys_width = 0.0
         hold_modifier_keys_height = 0.0
         separator_width = 0.0
-        if show_mouse_hold_status(prefs):
+        if prefs.use_mouse_hold_status:
             mouse_start_x = x
             mouse_start_y = y
             if prefs.use_custom_mouse_image:
@@ -1325,7 +2381,7 @@ class SK_OT_ScreencastKeys(bpy.types.Operator):
                                            prefs.font_size * 8)
             separator_width = \
                 mouse_width * cls.WIDTH_RATIO_FOR_SEPARATOR * ui_scale + margin
-        if show_mouse_hold_status(prefs) and cls.hold_modifier_keys:
+        if prefs.use_mouse_hold_status and cls.hold_modifier_keys:
             separator_width = \
                 mouse_width * cls.WIDTH_RATIO_FOR_SEPARATOR * ui_scale + margin
             if prefs.align == 'RIGHT':
@@ -1353,7 +2409,7 @@ class SK_OT_ScreencastKeys(bpy.types.Operator):
             mouse_start_y += (hold_modifier_keys_height - mouse_height) / 2
 
         # Draw hold mouse status.
-        if show_mouse_hold_status(prefs):
+        if prefs.use_mouse_hold_status:
             if prefs.use_custom_mouse_image:
                 draw_custom_mouse(mouse_start_x,
                                   mouse_start_y,
@@ -1388,7 +2444,7 @@ class SK_OT_ScreencastKeys(bpy.types.Operator):
             hold_modifier_keys_text_start_y = \
                 hold_modifier_keys_start_y + modifier_keys_box_margin
 
-            if show_text_background(prefs):
+            if prefs.use_text_background:
                 draw_text_background(
                     modifier_keys_text,
                     font_id,
@@ -1404,8 +2460,8 @@ class SK_OT_ScreencastKeys(bpy.types.Operator):
                     hold_modifier_keys_text_width,
                     hold_modifier_keys_text_height,
                     hold_modifier_keys_text_height * 0.2,
-                    show_text_background(prefs),
-                    prefs.background_color if show_text_background(prefs)
+                    prefs.use_text_background,
+                    prefs.background_color if prefs.use_text_background
                     else prefs.color,
                     line_thickness=prefs.line_thickness * ui_line_width)
 
@@ -1425,9 +2481,10 @@ class SK_OT_ScreencastKeys(bpy.types.Operator):
         return layer_width, layer_height, region_redraw
 
     @classmethod
+    @profiler.timed("draw_event_history_layer")
     def _draw_event_history_layer(cls, context, font_id, x, y):
         user_prefs = context.preferences
-        prefs = user_prefs.addons[__package__].preferences
+        prefs = get_preferences_snapshot()
         ui_scale = user_prefs.system.ui_scale
         margin = prefs.margin * ui_scale
 
@@ -1441,28 +2498,20 @@ class SK_OT_ScreencastKeys(bpy.types.Operator):
         event_start_x = x
         event_start_y = y
 
-        event_history = cls.removed_old_event_history()
-        if event_history:
+        event_history_lines = cls.event_history_lines(font_id)
+        if event_history_lines:
             layer_height += cls.text_area_height(font_id) * \
                 cls.HEIGHT_RATIO_FOR_SEPARATOR
             event_start_y += cls.text_area_height(font_id) * \
                 cls.HEIGHT_RATIO_FOR_SEPARATOR
-        for _, event_type, modifiers, repeat_count in event_history[::-1]:
-            text = get_display_event_text(event_type.name)
-            if modifiers:
-                mod_keys = cls.sorted_modifier_keys(modifiers)
-                text = "{} + {}".format(" + ".join(mod_keys), text)
-            if repeat_count > 1:
-                text += " x{}".format(repeat_count)
-
-            text_width = \
-                cls.text_area_width(text, font_id) + margin * 2
+        for text, text_width in event_history_lines:
+            text_width += margin * 2
             offset_x, offset_y = cls.get_alignment_offset(
                 context, text_width, margin)
             blf.position(font_id,
                          event_start_x + offset_x, event_start_y + offset_y,
                          0)
-            if show_text_background(prefs):
+            if prefs.use_text_background:
                 draw_text_background(text, font_id,
                                      event_start_x + offset_x,
                                      event_start_y + offset_y,
@@ -1480,82 +2529,97 @@ class SK_OT_ScreencastKeys(bpy.types.Operator):
         return layer_width, layer_height, region_drawn
 
     @classmethod
-    def draw_callback(cls, context):
-        user_prefs = context.preferences
-        prefs = user_prefs.addons[__package__].preferences
-        ui_scale = user_prefs.system.ui_scale
-        ui_line_width = user_prefs.system.ui_line_width
+    def overlay_fingerprint(cls, context, font_id):
+        """Return the values which determine the rendered overlay.
 
-        if cls.skip_draw(context):
-            return      # Skip if no contents will be displayed.
+        The values are relative to the origin, so the rendered overlay is
+        reused when the overlay is only translated (e.g. origin is 'CURSOR').
+        """
 
-        if context.window.as_pointer() != cls.origin["window"]:
-            return      # Not match target window.
+        _, _, _, origin_x, origin_y = cls.get_origin(context)
+        min_x, min_y, max_x, max_y = cls.draw_area_rect(context)
+        return (
+            (min_x - origin_x, min_y - origin_y,
+             max_x - origin_x, max_y - origin_y),
+            (origin_x - math.floor(origin_x), origin_y - math.floor(origin_y)),
+            cls.content_fingerprint(context, font_id),
+        )
 
-        rect = cls.draw_area_rect(context)
-        if not rect:
-            return      # No draw target.
+    @classmethod
+    def content_fingerprint(cls, context, font_id):
+        """Return the values which determine the content of the overlay.
 
-        draw_area_min_x, draw_area_min_y, draw_area_max_x, draw_area_max_y = \
-            rect
-        _, _, _, origin_x, origin_y = cls.get_origin(context)
-        draw_area_width = draw_area_max_x - origin_x
-        draw_area_height = draw_area_max_y - origin_y
-        if draw_area_width == draw_area_height == 0:
-            return
+        The position of the overlay is not included.
+        """
 
-        region = context.region
-        area = context.area
-        if region.type == 'WINDOW':
-            region_min_x, region_min_y, region_max_x, region_max_y = \
-                get_window_region_rect(area)
-        else:
-            region_min_x = region.x
-            region_min_y = region.y
-            region_max_x = region.x + region.width - 1
-            region_max_y = region.y + region.height - 1
-        if not intersect_aabb(
-                [region_min_x, region_min_y], [region_max_x, region_max_y],
-                [draw_area_min_x + 1, draw_area_min_y + 1],
-                [draw_area_max_x - 1, draw_area_max_y - 1]):
-            # We don't need to draw if draw area is not overlapped with region.
-            return
+        snapshot = cls.get_layout_snapshot()
+        fingerprint = snapshot.content_fingerprints.get(font_id)
+        if fingerprint is None:
+            fingerprint = cls._calc_content_fingerprint(context, font_id)
+            snapshot.content_fingerprints[font_id] = fingerprint
+        return fingerprint
 
-        region_drawn = False
+    @classmethod
+    def _calc_content_fingerprint(cls, context, font_id):
+        user_prefs = context.preferences
+        prefs = get_preferences_snapshot()
+        system = user_prefs.system
 
-        font_size = prefs.font_size
-        font_id = 0
-        dpi = user_prefs.system.dpi
-        compat.blf_size(font_id, font_size, dpi)
+        last_operator = None
+        operator_history = cls.removed_old_operator_history()
+        if operator_history and \
+                time.time() - operator_history[-1][0] <= prefs.display_time:
+            last_operator = tuple(operator_history[-1][1:3])
+
+        return (
+            system.ui_scale,
+            system.ui_line_width,
+            system.dpi,
+            tuple(cls.event_history_lines(font_id)),
+            last_operator,
+            tuple(cls.hold_modifier_keys),
+            tuple(cls.mouse_buttons_status.values()),
+            tuple(common.custom_mouse_textures.values()),
+            prefs.overlay_values,
+        )
 
-        # Clip 'TOOLS' and 'UI' region from 'WINDOW' region if need.
-        # This prevents from drawing multiple time when
-        # user_preferences.system.use_region_overlap is True.
-        if context.area.type == 'VIEW_3D' and region.type == 'WINDOW':
-            x_min, y_min, x_max, y_max = get_region_rect_on_v3d(context)
-            # Convert absolute coordinate to region local coordinate.
-            region_x_min = x_min - region.x
-            region_y_min = y_min - region.y
-            region_x_max = x_max - region.x + 1
-            region_y_max = y_max - region.y + 1
-            imm.immSetScissor(
-                [region_x_min, region_y_min, region_x_max, region_y_max])
+    @classmethod
+    @profiler.timed("draw_overlay")
+    def _draw_overlay(cls, context, font_id, base_x, base_y):
+        """Draw all layers.
+
+        (base_x, base_y) is the position of the draw target in the window
+        coordinate.
+        """
+
+        user_prefs = context.preferences
+        prefs = get_preferences_snapshot()
+        ui_scale = user_prefs.system.ui_scale
+        ui_line_width = user_prefs.system.ui_line_width
+
+        draw_area_min_x, draw_area_min_y, draw_area_max_x, draw_area_max_y = \
+            cls.draw_area_rect(context)
+        _, _, _, origin_x, origin_y = cls.get_origin(context)
 
         # Get start position to render.
-        x = origin_x - region.x
-        y = origin_y - region.y
+        x = origin_x - base_x
+        y = origin_y - base_y
 
         # Warm up rendering.
         # This is needed to render the line with more than 1.5 thickness
         # properly.
         draw_rect(0, 0, 0, 0, [0.0, 0.0, 0.0, 0.0])
 
+        # Record primitives and draw the primitives which share the same
+        # state at once.
+        imm.immBatchBegin()
+
         # Draw draw area based background.
-        if show_draw_area_background(prefs):
+        if prefs.use_draw_area_background:
             # Clip a last operator area if no operator is shown.
             _, baseline_y = cls.draw_area_baseline(context)
-            draw_rounded_box(draw_area_min_x - region.x,
-                             draw_area_min_y - region.y + baseline_y,
+            draw_rounded_box(draw_area_min_x - base_x,
+                             draw_area_min_y - base_y + baseline_y,
                              draw_area_max_x - draw_area_min_x,
                              draw_area_max_y - draw_area_min_y - baseline_y,
                              prefs.background_rounded_corner_radius * ui_scale,
@@ -1566,7 +2630,7 @@ class SK_OT_ScreencastKeys(bpy.types.Operator):
         def check_draw_status(cls, context, font_id, layer_name, calc_fn,
                               draw_x, draw_y, draw_w, draw_h):
             user_prefs = bpy.context.preferences
-            prefs = user_prefs.addons[__package__].preferences
+            prefs = get_preferences_snapshot()
             ui_line_width = user_prefs.system.ui_line_width
 
             if prefs.display_draw_area:
@@ -1588,35 +2652,109 @@ class SK_OT_ScreencastKeys(bpy.types.Operator):
 
         # Draw last operator.
         if prefs.show_last_operator:
-            w, h, rd = cls._draw_last_operator_layer(context, font_id, x, y)
+            w, h, _ = cls._draw_last_operator_layer(context, font_id, x, y)
             check_draw_status(cls, context, font_id, "Last Operator",
                               cls._area_size_last_operator_layer,
                               x, y, w, h)
             y += h
-            region_drawn = region_drawn if region_drawn else rd
 
         # Draw mouse and hold modifier keys
-        w, h, rd = cls._draw_mouse_and_modifier_keys_layer(
+        w, h, _ = cls._draw_mouse_and_modifier_keys_layer(
             context, font_id, x, y)
         check_draw_status(cls, context, font_id,
                           "Mouse and Hold Modifier Keys",
                           cls._area_size_mouse_and_modifier_keys_layer,
                           x, y, w, h)
         y += h
-        region_drawn = region_drawn if region_drawn else rd
 
         # Draw event history.
-        w, h, rd = cls._draw_event_history_layer(context, font_id, x, y)
+        w, h, _ = cls._draw_event_history_layer(context, font_id, x, y)
         check_draw_status(cls, context, font_id, "Event History",
                           cls._area_size_event_history_layer,
                           x, y, w, h)
         y += h
-        region_drawn = region_drawn if region_drawn else rd
 
-        imm.immSetScissor(None)
+        imm.immBatchEnd()
+
+    @classmethod
+    @profiler.timed("draw_callback")
+    @tracer.traced("draw_callback", region_trace_args)
+    def draw_callback(cls, context):
+        user_prefs = context.preferences
+        prefs = get_preferences_snapshot()
+        ui_scale = user_prefs.system.ui_scale
+
+        if cls.skip_draw(context):
+            return      # Skip if no contents will be displayed.
+
+        if context.window.as_pointer() != cls.origin["window"]:
+            return      # Not match target window.
+
+        rect = cls.draw_area_rect(context)
+        if not rect:
+            return      # No draw target.
+
+        draw_area_min_x, draw_area_min_y, draw_area_max_x, draw_area_max_y = \
+            rect
+        _, _, _, origin_x, origin_y = cls.get_origin(context)
+        draw_area_width = draw_area_max_x - origin_x
+        draw_area_height = draw_area_max_y - origin_y
+        if draw_area_width == draw_area_height == 0:
+            return
+
+        region = context.region
+        area = context.area
+        if region.type == 'WINDOW':
+            region_min_x, region_min_y, region_max_x, region_max_y = \
+                get_window_region_rect(area)
+        else:
+            region_min_x = region.x
+            region_min_y = region.y
+            region_max_x = region.x + region.width - 1
+            region_max_y = region.y + region.height - 1
+        if not intersect_aabb(
+                [region_min_x, region_min_y], [region_max_x, region_max_y],
+                [draw_area_min_x + 1, draw_area_min_y + 1],
+                [draw_area_max_x - 1, draw_area_max_y - 1]):
+            # We don't need to draw if draw area is not overlapped with region.
+            return
+
+        font_size = prefs.font_size
+        font_id = 0
+        dpi = user_prefs.system.dpi
+        text_metrics.set_size(font_id, font_size, dpi, ui_scale)
+
+        # Render the overlay into the offscreen buffer if the content is
+        # changed. This must be done before the scissor is set.
+        offscreen = None
+        if prefs.use_offscreen_rendering:
+            offscreen = cls.overlay_offscreen
+            fingerprint = cls.overlay_fingerprint(context, font_id)
+            if not offscreen.render(
+                    rect, fingerprint,
+                    lambda base_x, base_y: cls._draw_overlay(
+                        context, font_id, base_x, base_y)):
+                offscreen = None
+
+        # Clip 'TOOLS' and 'UI' region from 'WINDOW' region if need.
+        # This prevents from drawing multiple time when
+        # user_preferences.system.use_region_overlap is True.
+        if context.area.type == 'VIEW_3D' and region.type == 'WINDOW':
+            x_min, y_min, x_max, y_max = get_region_rect_on_v3d(context)
+            # Convert absolute coordinate to region local coordinate.
+            region_x_min = x_min - region.x
+            region_y_min = y_min - region.y
+            region_x_max = x_max - region.x + 1
+            region_y_max = y_max - region.y + 1
+            imm.immSetScissor(
+                [region_x_min, region_y_min, region_x_max, region_y_max])
+
+        if offscreen is not None:
+            offscreen.draw(region.x, region.y)
+        else:
+            cls._draw_overlay(context, font_id, region.x, region.y)
 
-        if region_drawn:
-            cls.draw_regions_prev.add(region.as_pointer())
+        imm.immSetScissor(None)
 
     @staticmethod
     def do_auto_save_before_v41():
@@ -1665,7 +2803,11 @@ class SK_OT_ScreencastKeys(bpy.types.Operator):
     @staticmethod
     @bpy.app.handlers.persistent
     def auto_save(_):
-        cls = SK_OT_ScreencastKeys
+        with tracer.span("auto_save"):
+            SK_OT_ScreencastKeys._auto_save()
+
+    @classmethod
+    def _auto_save(cls):
         context = bpy.context
         prefs = context.preferences
 
@@ -1768,11 +2910,17 @@ class SK_OT_ScreencastKeys(bpy.types.Operator):
            This makes SK_OT_ScreencastKeys.model method enable to get events
            consumed by other modalhandlers."""
 
+        with tracer.span("sort_modalhandlers"):
+            SK_OT_ScreencastKeys._sort_modalhandlers()
+
+    @staticmethod
+    def _sort_modalhandlers():
+
         user_preferences = bpy.context.preferences
         if user_preferences is None:
             return
 
-        prefs = user_preferences.addons[__package__].preferences
+        prefs = get_preferences_snapshot()
         if not prefs.get_event_aggressively:
             return
 
@@ -1833,17 +2981,21 @@ class SK_OT_ScreencastKeys(bpy.types.Operator):
 
         self.hold_modifier_keys.clear()
 
-        if event.shift:
+        state = (event.shift, event.oskey, event.alt, event.ctrl)
+        shift, oskey, alt, ctrl = state
+        if shift:
             self.hold_modifier_keys.append(EventType.LEFT_SHIFT)
-        if event.oskey:
+        if oskey:
             self.hold_modifier_keys.append(EventType.OSKEY)
-        if event.alt:
+        if alt:
             self.hold_modifier_keys.append(EventType.LEFT_ALT)
-        if event.ctrl:
+        if ctrl:
             self.hold_modifier_keys.append(EventType.LEFT_CTRL)
 
-        if EventType[event.type] == EventType.WINDOW_DEACTIVATE:
+        if event.type == 'WINDOW_DEACTIVATE':
             self.hold_modifier_keys.clear()
+            state = None
+        self.__class__.event_modifier_state = state
 
     def update_keys_status_internal(self, event):
         """Update internal keys status."""
@@ -1904,50 +3056,100 @@ class SK_OT_ScreencastKeys(bpy.types.Operator):
 
         self.mouse_buttons_status[event_type] = event.value
 
-    def is_ignore_event(self, event, prefs=None):
+    @staticmethod
+    def is_ignore_event(flags, prefs=None):
         """Return True if event will not be shown."""
 
-        event_type = EventType[event.type]
-        if event_type in {EventType.NONE, EventType.MOUSEMOVE,
-                          EventType.INBETWEEN_MOUSEMOVE,
-                          EventType.WINDOW_DEACTIVATE, EventType.TEXTINPUT}:
+        if flags & EVENT_FLAG_IGNORE:
             return True
         elif (prefs is not None) and \
-                (not show_mouse_event_history(prefs)) and \
-                (event_type in self.MOUSE_EVENT_TYPES):
-            return True
-        elif event_type.name.startswith("EVT_TWEAK"):
-            return True
-        elif event_type.name.startswith("TIMER"):
+                (not prefs.use_mouse_event_history) and \
+                (flags & EVENT_FLAG_MOUSE):
             return True
 
         return False
 
+    @classmethod
+    def update_mouse_co(cls, event):
+        cls.current_mouse_co = [event.mouse_x, event.mouse_y]
+        # Draw area follows the mouse cursor when origin is 'CURSOR'.
+        cls.get_layout_snapshot().invalidate_origin()
+
+    @classmethod
+    def ingest_pointer_event(cls, event):
+        """Consume the pointer event which only moves the mouse cursor.
+
+        The pointer event is processed fully only when the redraw tick is due,
+        the modifier keys are changed or any mouse button is held, because
+        the ignored events do nothing else before the next redraw tick.
+        Return False if the event needs to be processed fully.
+        """
+
+        if not cls.running:
+            return False
+
+        # Same condition as the redraw by the ignored events.
+        current_time = time.time()
+        prev_time = cls.prev_time
+        deadline = cls.timer_deadline
+        if (deadline is not None and current_time >= deadline) or \
+                prev_time and current_time - prev_time >= cls.TIMER_STEP:
+            return False
+        if cls.event_modifier_state != \
+                (event.shift, event.oskey, event.alt, event.ctrl):
+            return False
+        # 'MOUSEMOVE' releases the mouse buttons whose 'RELEASE' event is
+        # not fired (ex. open context menu, mouse drag, ...).
+        status = cls.mouse_buttons_status
+        if status['LEFTMOUSE'] != 'RELEASE' or \
+                status['RIGHTMOUSE'] != 'RELEASE' or \
+                status['MIDDLEMOUSE'] != 'RELEASE':
+            return False
+
+        cls.update_mouse_co(event)
+        return True
+
     def modal(self, context, event):
+        event_class = self.EVENT_CLASSES.get(event.type, UNKNOWN_EVENT_CLASS)
+        if event_class[1] & EVENT_FLAG_POINTER and \
+                self.ingest_pointer_event(event):
+            return {'PASS_THROUGH'}
+
+        with profiler.stage("modal"), tracer.span("modal"):
+            return self.process_event(context, event, event_class)
+
+    def process_event(self, context, event, event_class):
         user_prefs = context.preferences
-        prefs = user_prefs.addons[__package__].preferences
+        prefs = get_preferences_snapshot()
 
         if not self.__class__.is_running():
             return {'FINISHED'}
 
-        if event.type == '':
+        event_type, flags = event_class
+        if event_type is None:
             # Many events that should be identified as 'NONE', instead are
-            # identified as '' and raise KeyErrors in EventType
+            # identified as '' which is not found in EventType
             # (i.e. caps lock and the spin tool in edit mode)
             return {'PASS_THROUGH'}
 
-        if event.type == 'MOUSEMOVE':
-            self.__class__.current_mouse_co = [event.mouse_x, event.mouse_y]
+        if flags & EVENT_FLAG_POINTER:
+            self.update_mouse_co(event)
 
-        event_type = self.get_original_event_from_emulated(event, user_prefs)
-        event_type = EventType[event_type]
+        if event_type == EventType.MIDDLEMOUSE:
+            event_type = EventType[
+                self.get_original_event_from_emulated(event, user_prefs)]
 
         current_time = time.time()
 
         # Update Area - Space mapping.
-        for area in context.screen.areas:
-            for space in area.spaces:
-                self.area_spaces[area.as_pointer()].add(space.as_pointer())
+        # The areas are checked thoroughly only when the event may change
+        # the screen layout.
+        ignore_event = self.is_ignore_event(flags)
+        if self.screen_layout.update(context.screen,
+                                     full_check=not ignore_event):
+            self.invalidate_layout()
+            # Regions may be added, so redraw all regions under the overlay.
+            self.redraw_scheduler.invalidate()
 
         # Update hold modifiers keys.
         self.update_hold_modifier_keys(event)
@@ -1963,72 +3165,65 @@ class SK_OT_ScreencastKeys(bpy.types.Operator):
         self.update_mouse_buttons_status(event, user_prefs)
 
         # Update event history.
-        if not self.is_ignore_event(event, prefs=prefs) and \
-                not self.__class__.is_modifier_event(event) and \
+        if not self.is_ignore_event(flags, prefs=prefs) and \
+                not self.is_modifier_event(flags) and \
                 event.value == 'PRESS':
-            current_event = [current_time, event_type, current_mod_keys, 1]
+            current_event = EventRecord(current_time, event_type,
+                                        self.modifier_mask(current_mod_keys))
 
             if self.event_history:
                 last_event = self.event_history[-1]
-                delta_time = current_time - last_event[0]
-                is_same = last_event[1:-1] == current_event[1:-1]
+                delta_time = current_time - last_event.time
+                is_same = last_event.is_same(current_event)
+                # Bursts of the wheel events are coalesced into one entry,
+                # and all events in the burst are counted.
+                if prefs.repeat_count and is_same and \
+                        event_type in self.COALESCED_EVENT_TYPES and \
+                        delta_time < prefs.display_time:
+                    last_event.repeat(current_time)
                 # If events are raised in short time (e.g. Double Click), the
                 # additional events will be raised from the Internal of
                 # Blender. This check avoids not to count such events.
-                if is_same and delta_time < self.INTERVAL_FOR_IGNORE_EVENT:
+                elif is_same and delta_time < self.INTERVAL_FOR_IGNORE_EVENT:
                     pass
                 # If this event has same event_type and modifiers, we increment
                 # repeat_count. However, we reset repeat_count if event
                 # interval overs display time.
                 elif prefs.repeat_count and is_same and \
                         delta_time < prefs.display_time:
-                    last_event[0] = current_time
-                    last_event[-1] += 1
+                    last_event.repeat(current_time)
                 else:
                     self.event_history.append(current_event)
             else:
                 self.event_history.append(current_event)
-        self.event_history[:] = self.removed_old_event_history()
+        self.prune_event_history(prefs)
 
         # Update operator history.
-        operators = list(context.window_manager.operators)
-        if operators:
-            # Find last operator which detects in previous modal call.
-            if self.operator_history:
-                addr = self.operator_history[-1][-1]
-            else:
-                addr = None
-            prev_last_op_index = 0
-            for i, op in enumerate(operators[::-1]):
-                if op.as_pointer() == addr:
-                    prev_last_op_index = len(operators) - i
-                    break
-
-            # Add operators to history.
-            for op in operators[prev_last_op_index:]:
-                op_prefix, op_name = op.bl_idname.split("_OT_")
-                idname_py = "{}.{}".format(op_prefix.lower(), op_name)
-                self.operator_history.append(
-                    [current_time, op.bl_label, idname_py, op.as_pointer()])
-        self.operator_history[:] = self.removed_old_operator_history()
+        tracker = self.operator_tracker
+        for op in tracker.new_operators(context.window_manager.operators):
+            self.operator_history.append(
+                [current_time, op.bl_label, tracker.idname_py(op.bl_idname),
+                 op.as_pointer()])
 
         # Redraw regions which we want.
         prev_time = self.prev_time
-        if not self.is_ignore_event(event) or \
+        deadline = self.timer_deadline
+        if not ignore_event or \
+                (deadline is not None and current_time >= deadline) or \
                 prev_time and current_time - prev_time >= self.TIMER_STEP:
+            # Start a new redraw tick. Draw callbacks called from here share
+            # the layout calculated at first.
+            # The overlay following the mouse cursor keeps the layout until
+            # the content is changed.
+            content_stamp = self.content_stamp(user_prefs)
+            if prefs.origin != 'CURSOR' or \
+                    (deadline is not None and current_time >= deadline) or \
+                    content_stamp != self.layout_content_stamp:
+                self.invalidate_layout()
+                self.__class__.layout_content_stamp = content_stamp
+            profiler.next_frame()
             regions = self.find_redraw_regions(context)
-
-            # If regions which are drawn at previous time, is not draw target
-            # at this time, we don't need to redraw anymore.
-            # But we raise redraw notification to make sure there are no
-            # updates on their regions.
-            # If there is update on the region, it will be added to
-            # self.draw_regions_prev in draw_callback function.
-            for area in context.screen.areas:
-                for region in area.regions:
-                    if region.as_pointer() in self.draw_regions_prev:
-                        region.tag_redraw()
-                        self.draw_regions_prev.remove(region.as_pointer())
+            profiler.count("tagged_regions", len(regions))
 
             # Redraw all target regions.
             # If there is no draw handler attached to the region, we add it to.
@@ -2040,12 +3235,30 @@ class SK_OT_ScreencastKeys(bpy.types.Operator):
                         self.draw_callback, (context, ), region.type,
                         'POST_PIXEL')
                 region.tag_redraw()
-                self.draw_regions_prev.add(region.as_pointer())
 
             self.__class__.prev_time = current_time
 
+            if profiler.enabled:
+                self.redraw_profiler_panels(context, current_time)
+
+        self.update_event_timer(context, prefs)
+
         return {'PASS_THROUGH'}
 
+    @classmethod
+    def redraw_profiler_panels(cls, context, current_time):
+        """Redraw sidebars periodically to update the shown profile."""
+
+        if current_time - cls.profiler_panel_redraw_time < \
+                cls.PROFILER_PANEL_REDRAW_INTERVAL:
+            return
+        cls.profiler_panel_redraw_time = current_time
+
+        for area in context.screen.areas:
+            for region in area.regions:
+                if region.type == 'UI':
+                    region.tag_redraw()
+
     @classmethod
     def draw_handler_remove_all(cls):
         for (space_type, region_type), handle in cls.handlers.items():
@@ -2053,15 +3266,56 @@ class SK_OT_ScreencastKeys(bpy.types.Operator):
         cls.handlers.clear()
 
     @classmethod
-    def event_timer_add(cls, context):
+    def next_expiry_time(cls, prefs):
+        """Return the time when the displayed contents are changed next.
+           Return None if no contents will expire.
+        """
+
+        expiry_times = []
+        if cls.event_history:
+            # The oldest event expires first.
+            expiry_times.append(cls.event_history[0].time + prefs.display_time)
+        if prefs.show_last_operator and cls.operator_history:
+            expiry_time = cls.operator_history[-1][0] + prefs.display_time
+            if expiry_time >= time.time():
+                expiry_times.append(expiry_time)
+
+        if not expiry_times:
+            return None
+        return min(expiry_times)
+
+    @classmethod
+    def update_event_timer(cls, context, prefs):
+        """Arm the timers for the next expiry of the displayed contents.
+
+        No timers are running while no contents will expire.
+        """
+
+        deadline = cls.next_expiry_time(prefs)
+        if deadline is None:
+            if cls.timers:
+                cls.event_timer_remove(context)
+            return
+
+        current_time = time.time()
+        if deadline == cls.timer_deadline and current_time < deadline:
+            return      # Already armed.
+
+        cls.event_timer_remove(context)
+        time_step = max(deadline - current_time, cls.TIMER_STEP) + \
+            cls.TIMER_DELAY
+        cls.event_timer_add(context, time_step)
+        cls.timer_deadline = deadline
+
+    @classmethod
+    def event_timer_add(cls, context, time_step):
         wm = context.window_manager
 
         # Add timer to all windows.
         for window in wm.windows:
             key = window.as_pointer()
             if key not in cls.timers:
-                cls.timers[key] = wm.event_timer_add(cls.TIMER_STEP,
-                                                     window=window)
+                cls.timers[key] = wm.event_timer_add(time_step, window=window)
 
     @classmethod
     def event_timer_remove(cls, context):
@@ -2073,17 +3327,24 @@ class SK_OT_ScreencastKeys(bpy.types.Operator):
             if key in cls.timers:
                 wm.event_timer_remove(cls.timers[key])
         cls.timers.clear()
+        cls.timer_deadline = None
 
     @classmethod
     def start(cls, self, context, event, prefs):
+        invalidate_preferences_snapshot()
+        profiler.set_enabled(prefs.enable_profiler)
+        tracer.set_enabled(prefs.enable_tracing)
         common.reload_custom_mouse_image(prefs, context)
+        invalidate_display_event_text()
         self.update_hold_modifier_keys(event)
-        self.event_timer_add(context)
+        self.update_event_timer(context, prefs)
         context.window_manager.modal_handler_add(self)
         self.origin["window"] = context.window.as_pointer()
         self.origin["area"] = context.area.as_pointer()
         self.origin["space"] = context.space_data.as_pointer()
         self.origin["region_type"] = context.region.type
+        self.invalidate_layout()
+        self.redraw_scheduler.clear()
         context.area.tag_redraw()
         # extensions.blender.org: Delete block start
         if prefs.get_event_aggressively:
@@ -2107,13 +3368,44 @@ class SK_OT_ScreencastKeys(bpy.types.Operator):
         self.event_timer_remove(context)
         self.draw_handler_remove_all()
         self.hold_modifier_keys.clear()
+        self.__class__.event_modifier_state = None
         self.event_history.clear()
         self.operator_history.clear()
-        self.draw_regions_prev.clear()
+        self.operator_tracker.reset()
+        self.screen_layout.clear()
+        default_mouse_commands.clear()
+        region_rect_on_v3d_cache.clear()
+        self.overlay_offscreen.free()
+        self.redraw_scheduler.clear()
+        invalidate_preferences_snapshot()
+        self.invalidate_layout()
+        self.__class__.layout_content_stamp = None
         context.area.tag_redraw()
+        if tracer.enabled:
+            self.export_trace(self, context)
 
         cls.running = False
 
+    @classmethod
+    def export_trace(cls, self, context):
+        """Export the recorded spans and clear them."""
+
+        user_prefs = context.preferences
+        prefs = user_prefs.addons[__package__].preferences
+
+        filepath = bpy.path.abspath(prefs.trace_filepath)
+        if filepath == "":
+            filepath = os.path.join(bpy.app.tempdir,
+                                    "screencast_keys_trace.json")
+        try:
+            tracer.export(filepath)
+        except OSError as e:
+            self.report({'WARNING'},
+                        "Failed to export trace: {}".format(e))
+            return
+        tracer.clear()
+        self.report({'INFO'}, "Exported trace to {}".format(filepath))
+
     def invoke(self, context, event):
         cls = self.__class__
         user_prefs = context.preferences
@@ -2214,6 +3506,7 @@ class SK_OT_SetOrigin(bpy.types.Operator):
                 origin["area"] = area.as_pointer()
                 origin["space"] = area.spaces.active.as_pointer()
                 origin["region_type"] = region.type
+                SK_OT_ScreencastKeys.invalidate_layout()
                 self.draw_handler_remove_all()
                 return {'FINISHED'}
         elif event.type in {'RIGHTMOUSE', 'ESC'}:
@@ -2231,6 +3524,35 @@ class SK_OT_SetOrigin(bpy.types.Operator):
         return {'RUNNING_MODAL'}
 
 
+@BlClassRegistry()
+class SK_OT_DumpProfile(bpy.types.Operator):
+    bl_idname = "wm.sk_dump_profile"
+    bl_label = "Dump Profile"
+    bl_description = "Write the measured profile to the file"
+    bl_options = {'REGISTER'}
+
+    filepath: bpy.props.StringProperty(
+        subtype="FILE_PATH",
+        default="screencast_keys_profile.txt",
+    )
+
+    def invoke(self, context, _):
+        wm = context.window_manager
+        wm.fileselect_add(self)
+
+        return {'RUNNING_MODAL'}
+
+    def execute(self, _):
+        try:
+            profiler.dump(self.filepath)
+        except OSError as e:
+            self.report({'ERROR'}, "Failed to dump profile: {}".format(e))
+            return {'CANCELLED'}
+        self.report({'INFO'}, "Dumped profile to {}".format(self.filepath))
+
+        return {'FINISHED'}
+
+
 @BlClassRegistry()
 class SK_OT_WaitBlenderInitializedAndStartScreencastKeys(bpy.types.Operator):
     bl_idname = "wm.sk_wait_blender_initialized_and_start_screencast_keys"
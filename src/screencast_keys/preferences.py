@@ -25,8 +25,13 @@ from bpy.props import (
     EnumProperty,
 )
 
-from .ops import show_mouse_hold_status
+from .ops import (
+    show_mouse_hold_status,
+    invalidate_display_event_text,
+    invalidate_preferences_snapshot,
+)
 from .ui import SK_PT_ScreencastKeys, SK_PT_ScreencastKeys_Overlay
+from .profiler import profiler, tracer
 from .utils import compatibility as compat
 from .utils.addon_updater import AddonUpdaterManager    # extensions.blender.org: Delete line   # noqa # pylint: disable=C0301
 from .utils.bl_class_registry import BlClassRegistry
@@ -126,8 +131,17 @@ class SK_OT_SelectCustomMouseImage(bpy.types.Operator):
         return {'FINISHED'}
 
 
+# pylint: disable=W0613
+def update_display_event_text_aliases(self, _):
+    invalidate_display_event_text()
+
+
 class DisplayEventTextAliasProperties(bpy.types.PropertyGroup):
-    alias_text: bpy.props.StringProperty(name="Alias Text", default="")
+    alias_text: bpy.props.StringProperty(
+        name="Alias Text",
+        default="",
+        update=update_display_event_text_aliases,
+    )
     default_text: bpy.props.StringProperty(options={'HIDDEN'})
     event_id: bpy.props.StringProperty(options={'HIDDEN'})
 
@@ -139,13 +153,35 @@ def remove_custom_mouse_image(self, _):
             image = bpy.data.images[image_name]
             bpy.data.images.remove(image)
 
+    common.invalidate_custom_mouse_textures()
     remove_image(common.CUSTOM_MOUSE_IMG_BASE_NAME)
     remove_image(common.CUSTOM_MOUSE_IMG_LMOUSE_NAME)
     remove_image(common.CUSTOM_MOUSE_IMG_RMOUSE_NAME)
     remove_image(common.CUSTOM_MOUSE_IMG_MMOUSE_NAME)
 
 
+# pylint: disable=W0613
+def update_preferences_snapshot(self, _):
+    invalidate_preferences_snapshot()
+
+
+def update_use_custom_mouse_image(self, context):
+    invalidate_preferences_snapshot()
+    common.reload_custom_mouse_image(self, context)
+
+
+def update_enable_profiler(self, _):
+    profiler.set_enabled(self.enable_profiler)
+
+
+def update_enable_tracing(self, _):
+    tracer.set_enabled(self.enable_tracing)
+
+
 def update_custom_mouse_image_size(self, _):
+    common.invalidate_custom_mouse_textures()
+    invalidate_preferences_snapshot()
+
     # From Blender 5.0, the specification of bpy.types.AddonPreferences
     # is changed. This change does not allow dict based accesses.
     if compat.check_version(5, 0, 0) >= 0:
@@ -194,11 +230,13 @@ class SK_Preferences(bpy.types.AddonPreferences):
         max=1.0,
         subtype='COLOR_GAMMA',
         size=4,
+        update=update_preferences_snapshot,
     )
 
     shadow: bpy.props.BoolProperty(
         name="Shadow",
-        default=False
+        default=False,
+        update=update_preferences_snapshot,
     )
 
     shadow_color: bpy.props.FloatVectorProperty(
@@ -208,11 +246,13 @@ class SK_Preferences(bpy.types.AddonPreferences):
         max=1.0,
         subtype='COLOR',
         size=4,
+        update=update_preferences_snapshot,
     )
 
     background: bpy.props.BoolProperty(
         name="Background",
-        default=False
+        default=False,
+        update=update_preferences_snapshot,
     )
 
     background_mode: bpy.props.EnumProperty(
@@ -222,6 +262,7 @@ class SK_Preferences(bpy.types.AddonPreferences):
             ('DRAW_AREA', "Draw Area", ""),
         ],
         default='DRAW_AREA',
+        update=update_preferences_snapshot,
     )
 
     background_color: bpy.props.FloatVectorProperty(
@@ -231,6 +272,7 @@ class SK_Preferences(bpy.types.AddonPreferences):
         max=1.0,
         subtype='COLOR',
         size=4,
+        update=update_preferences_snapshot,
     )
 
     background_rounded_corner_radius: bpy.props.IntProperty(
@@ -239,13 +281,15 @@ class SK_Preferences(bpy.types.AddonPreferences):
         default=0,
         min=0,
         max=100,
+        update=update_preferences_snapshot,
     )
 
     font_size: bpy.props.IntProperty(
         name="Font Size",
         default=int(bpy.context.preferences.ui_styles[0].widget.points),
         min=6,
-        max=1000
+        max=1000,
+        update=update_preferences_snapshot,
     )
 
     margin: bpy.props.IntProperty(
@@ -253,14 +297,16 @@ class SK_Preferences(bpy.types.AddonPreferences):
         description="Margin",
         default=0,
         min=0,
-        max=1000
+        max=1000,
+        update=update_preferences_snapshot,
     )
 
     line_thickness: bpy.props.FloatProperty(
         name="Line Thickness",
         default=1,
         min=1,
-        max=100
+        max=100,
+        update=update_preferences_snapshot,
     )
 
     mouse_size: bpy.props.IntProperty(
@@ -268,6 +314,7 @@ class SK_Preferences(bpy.types.AddonPreferences):
         default=int(bpy.context.preferences.ui_styles[0].widget.points * 3),
         min=18,
         max=1000,
+        update=update_preferences_snapshot,
     )
 
     origin: bpy.props.EnumProperty(
@@ -279,6 +326,7 @@ class SK_Preferences(bpy.types.AddonPreferences):
             ('CURSOR', "Cursor", ""),
         ],
         default='REGION',
+        update=update_preferences_snapshot,
     )
 
     offset: bpy.props.IntVectorProperty(
@@ -286,6 +334,7 @@ class SK_Preferences(bpy.types.AddonPreferences):
         default=(20, 80),
         size=2,
         subtype='XYZ',
+        update=update_preferences_snapshot,
     )
 
     align: bpy.props.EnumProperty(
@@ -295,7 +344,8 @@ class SK_Preferences(bpy.types.AddonPreferences):
             ('CENTER', "Center", ""),
             ('RIGHT', "Right", ""),
         ],
-        default='LEFT'
+        default='LEFT',
+        update=update_preferences_snapshot,
     )
 
     display_time: bpy.props.FloatProperty(
@@ -304,7 +354,8 @@ class SK_Preferences(bpy.types.AddonPreferences):
         min=0.5,
         max=10.0,
         step=10,
-        subtype='TIME'
+        subtype='TIME',
+        update=update_preferences_snapshot,
     )
 
     max_event_history: bpy.props.IntProperty(
@@ -313,16 +364,19 @@ class SK_Preferences(bpy.types.AddonPreferences):
         default=5,
         min=1,
         step=1,
+        update=update_preferences_snapshot,
     )
 
     repeat_count: bpy.props.BoolProperty(
         name="Repeat Count",
         default=True,
+        update=update_preferences_snapshot,
     )
 
     show_mouse_events: bpy.props.BoolProperty(
         name="Show Mouse Events",
         default=True,
+        update=update_preferences_snapshot,
     )
 
     mouse_events_show_mode: bpy.props.EnumProperty(
@@ -334,12 +388,13 @@ class SK_Preferences(bpy.types.AddonPreferences):
              ""),
         ],
         default='HOLD_STATUS',
+        update=update_preferences_snapshot,
     )
 
     use_custom_mouse_image: bpy.props.BoolProperty(
         name="Use Custom Mouse Image",
         default=False,
-        update=common.reload_custom_mouse_image,
+        update=update_use_custom_mouse_image,
     )
 
     custom_mouse_image_display_mode: bpy.props.EnumProperty(
@@ -350,6 +405,7 @@ class SK_Preferences(bpy.types.AddonPreferences):
              "Displayed image will be overlayed on the base image"),
         ],
         default='OVERLAY',
+        update=update_preferences_snapshot,
     )
 
     custom_mouse_image_base: bpy.props.StringProperty(
@@ -401,11 +457,13 @@ class SK_Preferences(bpy.types.AddonPreferences):
         max=1000,
         size=2,
         subtype='XYZ',
+        update=update_preferences_snapshot,
     )
 
     show_last_operator: bpy.props.BoolProperty(
         name="Show Last Operator",
         default=False,
+        update=update_preferences_snapshot,
     )
 
     last_operator_show_mode: bpy.props.EnumProperty(
@@ -416,6 +474,7 @@ class SK_Preferences(bpy.types.AddonPreferences):
             ('LABEL_AND_IDNAME', "Label + ID Name", ""),
         ],
         default='LABEL_AND_IDNAME',
+        update=update_preferences_snapshot,
     )
 
     # extensions.blender.org: Delete block start
@@ -424,6 +483,7 @@ class SK_Preferences(bpy.types.AddonPreferences):
         description="(Experimental) Get events which will be dropped by the"
                     "other modalhandlers. This may make blender unstable",
         default=not cstruct.NOT_SUPPORTED,
+        update=update_preferences_snapshot,
     )
     # extensions.blender.org: Delete block end
 
@@ -432,6 +492,16 @@ class SK_Preferences(bpy.types.AddonPreferences):
         description="(Experimental) Enable custom auto save while modal "
                     "operator is running. This may make blender unstable",
         default=False,
+        update=update_preferences_snapshot,
+    )
+
+    use_offscreen_rendering: bpy.props.BoolProperty(
+        name="Offscreen Rendering",
+        description="(Experimental) Render the overlay into an offscreen "
+                    "buffer only when the content is changed, and copy it "
+                    "to each region",
+        default=False,
+        update=update_preferences_snapshot,
     )
 
     output_debug_log: bpy.props.BoolProperty(
@@ -443,7 +513,33 @@ class SK_Preferences(bpy.types.AddonPreferences):
     display_draw_area: bpy.props.BoolProperty(
         name="Display Draw Area",
         description="(Debug) Display draw area",
-        default=False
+        default=False,
+        update=update_preferences_snapshot,
+    )
+
+    enable_profiler: bpy.props.BoolProperty(
+        name="Profiler",
+        description="(Debug) Measure the time of each stage and the counts "
+                    "of draw calls per frame, and show them in the sidebar",
+        default=False,
+        update=update_enable_profiler,
+    )
+
+    enable_tracing: bpy.props.BoolProperty(
+        name="Tracing",
+        description="(Debug) Record the spans of the modal and draw "
+                    "processing, and export them as Chrome Trace Event "
+                    "JSON when Screencast Keys is stopped",
+        default=False,
+        update=update_enable_tracing,
+    )
+
+    trace_filepath: bpy.props.StringProperty(
+        name="Trace File",
+        description="File to export the trace (Temporary directory is used "
+                    "if empty)",
+        default="",
+        subtype='FILE_PATH',
     )
 
     # for UI.
@@ -518,11 +614,16 @@ class SK_Preferences(bpy.types.AddonPreferences):
     )
 
     # for display event text alias
+    def display_event_text_aliases_update_fn(self, context):
+        self.ui_in_overlay_update_fn(context)
+        invalidate_display_event_text()
+        invalidate_preferences_snapshot()
+
     enable_display_event_text_aliases: bpy.props.BoolProperty(
         name="Enable Display Event Text Aliases",
         description="Enable display event text aliases",
         default=False,
-        update=ui_in_overlay_update_fn,
+        update=display_event_text_aliases_update_fn,
     )
 
     display_event_text_aliases_props: bpy.props.CollectionProperty(
@@ -689,6 +790,7 @@ class SK_Preferences(bpy.types.AddonPreferences):
             col = layout.column()
             col.prop(self, "get_event_aggressively")    # extensions.blender.org: Delete line   # noqa # pylint: disable=C0301
             col.prop(self, "auto_save")
+            col.prop(self, "use_offscreen_rendering")
 
             layout.separator()
 
@@ -696,6 +798,10 @@ class SK_Preferences(bpy.types.AddonPreferences):
             col = layout.column()
             col.prop(self, "output_debug_log")
             col.prop(self, "display_draw_area")
+            col.prop(self, "enable_profiler")
+            col.prop(self, "enable_tracing")
+            if self.enable_tracing:
+                col.prop(self, "trace_filepath")
 
         elif self.category == 'DISPLAY_EVENT_TEXT_ALIAS':
             layout.separator()
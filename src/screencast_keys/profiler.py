@@ -0,0 +1,369 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# <pep8 compliant>
+
+
+import collections
+import functools
+import json
+import os
+import threading
+import time
+
+
+class RollingStats:
+    """Keep the latest samples and calculate percentiles of them."""
+
+    __slots__ = ("samples", "count", "total")
+
+    def __init__(self, window_size):
+        self.samples = collections.deque(maxlen=window_size)
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, value):
+        self.samples.append(value)
+        self.count += 1
+        self.total += value
+
+    def percentiles(self, ratios=(0.5, 0.95, 0.99)):
+        """Return the percentiles of the latest samples by the nearest-rank
+        method."""
+
+        if not self.samples:
+            return tuple(0.0 for _ in ratios)
+        samples = sorted(self.samples)
+        last = len(samples) - 1
+        return tuple(samples[min(last, int(r * len(samples)))]
+                     for r in ratios)
+
+    def mean(self):
+        if not self.samples:
+            return 0.0
+        return sum(self.samples) / len(self.samples)
+
+
+class StageTimer:
+    """Context manager to measure the time of the stage."""
+
+    __slots__ = ("owner", "name", "start")
+
+    def __init__(self, owner, name):
+        self.owner = owner
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        if self.owner.enabled:
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *_):
+        if self.start is not None:
+            self.owner.add_time(self.name, time.perf_counter() - self.start)
+            self.start = None
+
+
+class Profiler:
+    """Per-stage timers and per-frame counters of the hot paths.
+
+    Nothing is measured while the profiler is disabled except one attribute
+    check per stage.
+    A frame is the interval between the redraw ticks, which is notified by
+    next_frame.
+    """
+
+    WINDOW_SIZE = 1000
+
+    def __init__(self):
+        self.enabled = False
+        # Format: {stage_name: RollingStats (seconds)}
+        self.stages = collections.OrderedDict()
+        # Format: {counter_name: RollingStats (counts per frame)}
+        self.counters = collections.OrderedDict()
+        # Counts in the current frame.
+        self.frame_counts = collections.Counter()
+        # Functions which return the cumulative count.
+        # Format: {counter_name: (fn, last_value)}
+        self.counter_sources = collections.OrderedDict()
+        self.timers = {}
+        self.num_frames = 0
+
+    def set_enabled(self, enabled):
+        if enabled and not self.enabled:
+            self.reset()
+        self.enabled = enabled
+
+    def reset(self):
+        self.stages.clear()
+        self.counters.clear()
+        self.frame_counts.clear()
+        for name, (fn, _) in self.counter_sources.items():
+            self.counter_sources[name] = (fn, fn())
+        self.num_frames = 0
+
+    def add_counter_source(self, name, fn):
+        """Count the increase of the value returned by fn per frame."""
+
+        self.counter_sources[name] = (fn, fn())
+
+    def add_time(self, name, seconds):
+        stats = self.stages.get(name)
+        if stats is None:
+            stats = RollingStats(self.WINDOW_SIZE)
+            self.stages[name] = stats
+        stats.add(seconds)
+
+    def count(self, name, num=1):
+        if self.enabled:
+            self.frame_counts[name] += num
+
+    def next_frame(self):
+        if not self.enabled:
+            return
+
+        frame_counts = self.frame_counts
+        for name, (fn, last_value) in self.counter_sources.items():
+            value = fn()
+            frame_counts[name] += value - last_value
+            self.counter_sources[name] = (fn, value)
+
+        for name, num in frame_counts.items():
+            stats = self.counters.get(name)
+            if stats is None:
+                stats = RollingStats(self.WINDOW_SIZE)
+                # Frames before the counter appeared have no count.
+                stats.samples.extend([0] * min(self.num_frames,
+                                               self.WINDOW_SIZE))
+                self.counters[name] = stats
+            stats.add(num)
+        for name, stats in self.counters.items():
+            if name not in frame_counts:
+                stats.add(0)
+        frame_counts.clear()
+        self.num_frames += 1
+
+    def stage(self, name):
+        """Return the context manager which measures the time of the
+        stage."""
+
+        timer = self.timers.get(name)
+        if timer is None:
+            timer = StageTimer(self, name)
+            self.timers[name] = timer
+        return timer
+
+    def timed(self, name):
+        """Decorator which measures the time of the function."""
+
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.add_time(name, time.perf_counter() - start)
+            return wrapper
+        return decorator
+
+    def stage_rows(self):
+        """Return [(stage_name, count, p50, p95, p99), ...] in
+        milliseconds."""
+
+        rows = []
+        for name, stats in self.stages.items():
+            p50, p95, p99 = stats.percentiles()
+            rows.append((name, stats.count,
+                         p50 * 1000.0, p95 * 1000.0, p99 * 1000.0))
+        return rows
+
+    def counter_rows(self):
+        """Return [(counter_name, mean, p50, p95, p99), ...] per frame."""
+
+        rows = []
+        for name, stats in self.counters.items():
+            p50, p95, p99 = stats.percentiles()
+            rows.append((name, stats.mean(), p50, p95, p99))
+        return rows
+
+    def report(self):
+        lines = [
+            "Screencast Keys Profile",
+            "Frames: {}".format(self.num_frames),
+            "",
+            "{:<40}{:>10}{:>12}{:>12}{:>12}".format(
+                "Stage", "Count", "p50 [ms]", "p95 [ms]", "p99 [ms]"),
+        ]
+        for name, count, p50, p95, p99 in self.stage_rows():
+            lines.append("{:<40}{:>10}{:>12.3f}{:>12.3f}{:>12.3f}".format(
+                name, count, p50, p95, p99))
+        lines.append("")
+        lines.append("{:<40}{:>10}{:>12}{:>12}{:>12}".format(
+            "Counter (per frame)", "Mean", "p50", "p95", "p99"))
+        for name, mean, p50, p95, p99 in self.counter_rows():
+            lines.append("{:<40}{:>10.2f}{:>12}{:>12}{:>12}".format(
+                name, mean, p50, p95, p99))
+        return lines
+
+    def dump(self, filepath):
+        with open(filepath, "w", encoding="utf-8") as f:
+            f.write("\n".join(self.report()))
+            f.write("\n")
+
+
+class NullSpan:
+    """Span returned while the tracer is disabled."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        pass
+
+
+NULL_SPAN = NullSpan()
+
+
+class TraceSpan:
+    """Context manager to record the begin and end of the span."""
+
+    __slots__ = ("owner", "name", "args", "start")
+
+    def __init__(self, owner, name, args):
+        self.owner = owner
+        self.name = name
+        self.args = args
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *_):
+        self.owner.add_span(self.name, self.start, time.perf_counter(),
+                            self.args)
+
+
+class Tracer:
+    """Record spans into the ring buffer, and export them as the Chrome
+    Trace Event Format JSON which can be opened by Perfetto or
+    chrome://tracing.
+    """
+
+    BUFFER_SIZE = 100000
+    CATEGORY = "screencast_keys"
+
+    def __init__(self):
+        self.enabled = False
+        # Format: deque([(name, start, end, thread_id, args), ...])
+        # start and end are the values of time.perf_counter().
+        self.spans = collections.deque(maxlen=self.BUFFER_SIZE)
+
+    def set_enabled(self, enabled):
+        if enabled and not self.enabled:
+            self.clear()
+        self.enabled = enabled
+
+    def clear(self):
+        self.spans.clear()
+
+    def add_span(self, name, start, end, args=None):
+        self.spans.append((name, start, end, threading.get_ident(), args))
+
+    def span(self, name, args=None):
+        """Return the context manager which records the span."""
+
+        if not self.enabled:
+            return NULL_SPAN
+        return TraceSpan(self, name, args)
+
+    def traced(self, name, args_fn=None):
+        """Decorator which records the span of the function.
+
+        args_fn is called with the arguments of the function, and returns
+        the dict which is attached to the span.
+        """
+
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.add_span(
+                        name, start, time.perf_counter(),
+                        args_fn(*args, **kwargs) if args_fn else None)
+            return wrapper
+        return decorator
+
+    def trace_events(self):
+        pid = os.getpid()
+        events = [{
+            "name": "process_name",
+            "ph": "M",
+            "pid": pid,
+            "args": {"name": "Blender (Screencast Keys)"},
+        }]
+        thread_ids = set()
+        for name, start, end, thread_id, args in self.spans:
+            event = {
+                "name": name,
+                "cat": self.CATEGORY,
+                "ph": "X",
+                "ts": start * 1000000.0,
+                "dur": (end - start) * 1000000.0,
+                "pid": pid,
+                "tid": thread_id,
+            }
+            if args:
+                event["args"] = args
+            events.append(event)
+            thread_ids.add(thread_id)
+
+        main_thread_id = threading.main_thread().ident
+        for thread_id in sorted(thread_ids):
+            events.append({
+                "name": "thread_name",
+                "ph": "M",
+                "pid": pid,
+                "tid": thread_id,
+                "args": {"name": "Main" if thread_id == main_thread_id
+                         else "Thread {}".format(thread_id)},
+            })
+        return events
+
+    def export(self, filepath):
+        data = {
+            "traceEvents": self.trace_events(),
+            "displayTimeUnit": "ms",
+        }
+        with open(filepath, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+
+
+profiler = Profiler()
+tracer = Tracer()
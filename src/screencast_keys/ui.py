@@ -22,6 +22,7 @@
 import bpy
 
 from .ops import show_mouse_hold_status
+from .profiler import profiler
 
 
 class SK_PT_ScreencastKeys(bpy.types.Panel):
@@ -136,6 +137,30 @@ class SK_PT_ScreencastKeys(bpy.types.Panel):
 
         # extensions.blender.org: Delete block end
 
+        if prefs.enable_profiler:
+            column.separator()
+            self.draw_profile(column)
+
+    def draw_profile(self, layout):
+        layout.label(text="Profiler:")
+
+        box = layout.box()
+        col = box.column(align=True)
+        col.label(text="Time [ms] (p50 / p95 / p99):")
+        for name, _, p50, p95, p99 in profiler.stage_rows():
+            row = col.row()
+            row.label(text=name)
+            row.label(text="{:.2f} / {:.2f} / {:.2f}".format(p50, p95, p99))
+
+        col.separator()
+        col.label(text="Per Frame (p50 / p95 / p99):")
+        for name, _, p50, p95, p99 in profiler.counter_rows():
+            row = col.row()
+            row.label(text=name)
+            row.label(text="{} / {} / {}".format(p50, p95, p99))
+
+        layout.operator("wm.sk_dump_profile", text="Dump Profile")
+
 
 class SK_PT_ScreencastKeys_Overlay(bpy.types.Panel):
     bl_label = ""
@@ -0,0 +1,720 @@
+"""Stand-in modules for bpy, blf and gpu.
+
+The modules installed by install() provide the subset of the Blender Python
+API used by Screencast Keys. The calls reported by the benchmarks (blf.draw,
+blf.dimensions, gpu batches, RNA attribute reads, draw callbacks and region
+redraws) are counted in CALLS.
+"""
+
+import collections
+import sys
+import types
+
+
+CALLS = collections.Counter()
+
+
+# Event types taken from bpy.types.Event.bl_rna.properties["type"].
+_EVENT_TYPE_IDENTIFIERS = [
+    "NONE", "LEFTMOUSE", "MIDDLEMOUSE", "RIGHTMOUSE", "BUTTON4MOUSE",
+    "BUTTON5MOUSE", "BUTTON6MOUSE", "BUTTON7MOUSE", "PEN", "ERASER",
+    "MOUSEMOVE", "INBETWEEN_MOUSEMOVE", "TRACKPADPAN", "TRACKPADZOOM",
+    "MOUSEROTATE", "MOUSESMARTZOOM", "WHEELUPMOUSE", "WHEELDOWNMOUSE",
+    "WHEELINMOUSE", "WHEELOUTMOUSE",
+    *[chr(c) for c in range(ord("A"), ord("Z") + 1)],
+    "ZERO", "ONE", "TWO", "THREE", "FOUR", "FIVE", "SIX", "SEVEN",
+    "EIGHT", "NINE",
+    "LEFT_CTRL", "LEFT_ALT", "LEFT_SHIFT", "RIGHT_ALT", "RIGHT_CTRL",
+    "RIGHT_SHIFT", "OSKEY", "APP", "GRLESS", "ESC", "TAB", "RET", "SPACE",
+    "LINE_FEED", "BACK_SPACE", "DEL", "SEMI_COLON", "PERIOD", "COMMA",
+    "QUOTE", "ACCENT_GRAVE", "MINUS", "PLUS", "SLASH", "BACK_SLASH",
+    "EQUAL", "LEFT_BRACKET", "RIGHT_BRACKET", "LEFT_ARROW", "DOWN_ARROW",
+    "RIGHT_ARROW", "UP_ARROW", "NUMPAD_2", "NUMPAD_4", "NUMPAD_6",
+    "NUMPAD_8", "NUMPAD_1", "NUMPAD_3", "NUMPAD_5", "NUMPAD_7",
+    "NUMPAD_9", "NUMPAD_PERIOD", "NUMPAD_SLASH", "NUMPAD_ASTERIX",
+    "NUMPAD_0", "NUMPAD_MINUS", "NUMPAD_ENTER", "NUMPAD_PLUS",
+    *["F{}".format(i) for i in range(1, 25)],
+    "PAUSE", "INSERT", "HOME", "PAGE_UP", "PAGE_DOWN", "END",
+    "MEDIA_PLAY", "MEDIA_STOP", "MEDIA_FIRST", "MEDIA_LAST", "TEXTINPUT",
+    "WINDOW_DEACTIVATE", "TIMER", "TIMER0", "TIMER1", "TIMER2",
+    "TIMER_JOBS", "TIMER_AUTOSAVE", "TIMER_REPORT", "TIMERREGION",
+    "NDOF_MOTION", "NDOF_BUTTON_MENU", "ACTIONZONE_AREA",
+    "ACTIONZONE_REGION", "ACTIONZONE_FULLSCREEN", "XR_ACTION",
+]
+
+_EVENT_TYPE_NAMES = {
+    "LEFTMOUSE": "Left Mouse",
+    "MIDDLEMOUSE": "Middle Mouse",
+    "RIGHTMOUSE": "Right Mouse",
+    "MOUSEMOVE": "Mouse Move",
+    "WHEELUPMOUSE": "Wheel Up",
+    "WHEELDOWNMOUSE": "Wheel Down",
+    "LEFT_CTRL": "Left Ctrl",
+    "LEFT_ALT": "Left Alt",
+    "LEFT_SHIFT": "Left Shift",
+    "RIGHT_ALT": "Right Alt",
+    "RIGHT_CTRL": "Right Ctrl",
+    "RIGHT_SHIFT": "Right Shift",
+    "OSKEY": "OS Key",
+    "SPACE": "Spacebar",
+    "RET": "Return",
+}
+
+
+class _EnumItem:
+    def __init__(self, identifier, value):
+        self.identifier = identifier
+        self.value = value
+        self.name = _EVENT_TYPE_NAMES.get(
+            identifier, identifier.replace("_", " ").title())
+
+
+# ---------------------------------------------------------------------------
+# Pointer-backed data.
+# ---------------------------------------------------------------------------
+
+_next_pointer = [0x1000]
+
+# Regions tagged by tag_redraw since the last run_draw_handlers.
+TAGGED_REGIONS = set()
+
+
+def _new_pointer():
+    _next_pointer[0] += 0x100
+    return _next_pointer[0]
+
+
+class _Pointer:
+    def __init__(self):
+        self._ptr = _new_pointer()
+
+    def as_pointer(self):
+        return self._ptr
+
+    def __eq__(self, other):
+        return isinstance(other, _Pointer) and self._ptr == other._ptr
+
+    def __hash__(self):
+        return self._ptr
+
+
+class Region(_Pointer):
+    def __init__(self, type_, x, y, width, height):
+        super().__init__()
+        self.type = type_
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+
+    def tag_redraw(self):
+        CALLS["region.tag_redraw"] += 1
+        TAGGED_REGIONS.add(self)
+
+
+class Space(_Pointer):
+    def __init__(self, type_):
+        super().__init__()
+        self.type = type_
+
+
+class _Spaces(list):
+    @property
+    def active(self):
+        return self[0]
+
+
+class Area(_Pointer):
+    def __init__(self, type_, x, y, width, height):
+        super().__init__()
+        self.type = type_
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.spaces = _Spaces([Space(type_)])
+        header = 26
+        self.regions = [
+            Region('HEADER', x, y + height - header, width, header),
+            Region('WINDOW', x, y, width, height - header),
+        ]
+        if type_ == 'VIEW_3D':
+            self.regions.append(
+                Region('TOOLS', x, y, 40, height - header))
+            self.regions.append(
+                Region('UI', x + width - 200, y, 200, height - header))
+
+    def tag_redraw(self):
+        TAGGED_REGIONS.update(self.regions)
+
+
+class Screen(_Pointer):
+    def __init__(self, areas):
+        super().__init__()
+        self.areas = areas
+
+
+class Window(_Pointer):
+    def __init__(self, screen, width, height):
+        super().__init__()
+        self.screen = screen
+        self.width = width
+        self.height = height
+        self.modal_operators = []
+
+
+class Operator:
+    # pylint: disable=R0903
+    def __init__(self, bl_idname, bl_label):
+        self._ptr = _new_pointer()
+        self.bl_idname = bl_idname
+        self.bl_label = bl_label
+
+    def as_pointer(self):
+        return self._ptr
+
+
+class WindowManager:
+    def __init__(self):
+        self.windows = []
+        self.operators = []
+        self.keyconfigs = types.SimpleNamespace(addon=None)
+
+    def event_timer_add(self, time_step, window=None):
+        return types.SimpleNamespace(time_step=time_step, window=window)
+
+    def event_timer_remove(self, _timer):
+        pass
+
+    def modal_handler_add(self, _op):
+        pass
+
+
+class Event:
+    # pylint: disable=R0902
+    def __init__(self, type_, value='PRESS', mouse_x=0, mouse_y=0,
+                 shift=False, ctrl=False, alt=False, oskey=False):
+        self.type = type_
+        self.value = value
+        self.mouse_x = mouse_x
+        self.mouse_y = mouse_y
+        self.shift = shift
+        self.ctrl = ctrl
+        self.alt = alt
+        self.oskey = oskey
+
+
+# ---------------------------------------------------------------------------
+# Properties and preferences.
+# ---------------------------------------------------------------------------
+
+class _PropertyDeferred:
+    # pylint: disable=R0903
+    def __init__(self, kind, kwargs):
+        self.kind = kind
+        self.kwargs = kwargs
+
+    def default_value(self):
+        if self.kind == "CollectionProperty":
+            return _Collection(self.kwargs["type"])
+        if "default" in self.kwargs:
+            default = self.kwargs["default"]
+            if isinstance(default, tuple):
+                return list(default)
+            return default
+        if self.kind == "EnumProperty":
+            items = self.kwargs.get("items")
+            if isinstance(items, list) and items:
+                return items[0][0]
+            return ""
+        return {
+            "BoolProperty": False,
+            "IntProperty": 0,
+            "FloatProperty": 0.0,
+            "StringProperty": "",
+        }.get(self.kind)
+
+
+class _Collection(list):
+    def __init__(self, item_type):
+        super().__init__()
+        self.item_type = item_type
+
+    def add(self):
+        item = _instantiate(self.item_type)
+        self.append(item)
+        return item
+
+
+def _make_prop(kind):
+    def prop(**kwargs):
+        return _PropertyDeferred(kind, kwargs)
+    prop.__name__ = kind
+    return prop
+
+
+def _annotations(cls):
+    result = {}
+    for klass in reversed(cls.__mro__):
+        result.update(getattr(klass, "__annotations__", {}))
+    return result
+
+
+def _instantiate(cls):
+    inst = cls.__new__(cls)
+    for name, prop in _annotations(cls).items():
+        if isinstance(prop, _PropertyDeferred):
+            object.__setattr__(inst, name, prop.default_value())
+    return inst
+
+
+class _RNAStruct:
+    """Property owner which fires 'update' callbacks like bpy_struct."""
+
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        prop = _annotations(type(self)).get(name)
+        if isinstance(prop, _PropertyDeferred):
+            update = prop.kwargs.get("update")
+            if update is not None:
+                update(self, context)
+
+    def __getattribute__(self, name):
+        if not name.startswith("_"):
+            CALLS["rna.getattr"] += 1
+        return object.__getattribute__(self, name)
+
+    def __contains__(self, name):
+        return name in _annotations(type(self))
+
+    def __getitem__(self, name):
+        return getattr(self, name)
+
+
+# ---------------------------------------------------------------------------
+# Images.
+# ---------------------------------------------------------------------------
+
+class Image:
+    def __init__(self, name, filepath=""):
+        self.name = name
+        self.filepath = filepath
+        self.size = [64, 64]
+        self.use_fake_user = False
+        self.preview = types.SimpleNamespace(icon_id=0)
+        self.colorspace_settings = types.SimpleNamespace(name="sRGB")
+
+    def preview_ensure(self):
+        pass
+
+    def gl_load(self):
+        pass
+
+
+class _Images(dict):
+    def __iter__(self):
+        return iter(self.values())
+
+    def load(self, filepath):
+        image = Image(filepath, filepath)
+        self[filepath] = image
+        return _RenamingImage(self, image)
+
+    def remove(self, image):
+        self.pop(image.name, None)
+
+
+class _RenamingImage:
+    """Keep the _Images mapping in sync when 'name' is assigned."""
+
+    def __init__(self, images, image):
+        object.__setattr__(self, "_images", images)
+        object.__setattr__(self, "_image", image)
+
+    def __getattr__(self, name):
+        return getattr(self._image, name)
+
+    def __setattr__(self, name, value):
+        if name == "name":
+            self._images.pop(self._image.name, None)
+            self._images[value] = self._image
+        setattr(self._image, name, value)
+
+
+# ---------------------------------------------------------------------------
+# Module construction.
+# ---------------------------------------------------------------------------
+
+def _module(name, **attrs):
+    mod = types.ModuleType(name)
+    mod.__dict__.update(attrs)
+    sys.modules[name] = mod
+    return mod
+
+
+class _Space(_Pointer):
+    """Base class of bpy.types.Space* with draw handler registry."""
+
+    draw_handlers = []
+
+    @classmethod
+    def draw_handler_add(cls, fn, args, region_type, draw_type):
+        handle = (cls, fn, args, region_type, draw_type)
+        _Space.draw_handlers.append(handle)
+        return handle
+
+    @classmethod
+    def draw_handler_remove(cls, handle, _region_type):
+        if handle in _Space.draw_handlers:
+            _Space.draw_handlers.remove(handle)
+
+
+class _Matrix:
+    # pylint: disable=R0903
+    def __matmul__(self, other):
+        return self
+
+
+class _Shader:
+    def __init__(self, name):
+        self.name = name
+
+    def bind(self):
+        pass
+
+    def uniform_float(self, _name, _value):
+        pass
+
+    def uniform_int(self, _name, _value):
+        pass
+
+    def uniform_sampler(self, _name, _value):
+        pass
+
+
+class _Batch:
+    # pylint: disable=R0903
+    def draw(self, _shader=None):
+        CALLS["batch.draw"] += 1
+
+
+class _MatrixPushPop:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        pass
+
+
+def _batch_for_shader(_shader, _prim_type, _content, **_):
+    CALLS["batch_for_shader"] += 1
+    return _Batch()
+
+
+class _Texture:
+    # pylint: disable=R0903
+    def __init__(self, image):
+        self.image = image
+
+
+class _OffScreen:
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.texture_color = _Texture(None)
+
+    def bind(self):
+        return self
+
+    def unbind(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        pass
+
+    def free(self):
+        pass
+
+
+class _FrameBuffer:
+    def clear(self, **_):
+        pass
+
+    def free(self):
+        pass
+
+
+def _gpu_texture_from_image(image):
+    return _Texture(image)
+
+
+def _blf_counted(name):
+    def counted(*_args):
+        CALLS["blf." + name] += 1
+    counted.__name__ = name
+    return counted
+
+
+def _blf_noop(*_args):
+    pass
+
+
+class _BlfState:
+    size = 11
+
+
+def _blf_size(_font_id, size, _dpi=None):
+    _BlfState.size = size
+
+
+def _blf_dimensions(_font_id, text):
+    CALLS["blf.dimensions"] += 1
+    return (len(text) * _BlfState.size * 0.55, _BlfState.size * 1.2)
+
+
+class _Preferences:
+    # pylint: disable=R0903
+    def __init__(self, package):
+        self.system = types.SimpleNamespace(
+            ui_scale=1.0, dpi=72, ui_line_width=1.0,
+            use_region_overlap=True)
+        self.inputs = types.SimpleNamespace(use_mouse_emulate_3_button=False)
+        self.ui_styles = [types.SimpleNamespace(
+            widget=types.SimpleNamespace(points=11))]
+        self.filepaths = types.SimpleNamespace(
+            use_auto_save_temporary_files=False, auto_save_time=2)
+        self.addons = {}
+        self.package = package
+
+
+class _Context:
+    # pylint: disable=R0902,R0903
+    def __init__(self, package):
+        self.preferences = _Preferences(package)
+        self.window_manager = WindowManager()
+        self.window = None
+        self.screen = None
+        self.area = None
+        self.region = None
+        self.space_data = None
+
+
+context = None   # pylint: disable=C0103
+
+
+def install(package="screencast_keys"):
+    """Install the stand-in modules into sys.modules."""
+
+    # pylint: disable=W0603,C0103
+    global context
+    context = _Context(package)
+
+    bpy = _module("bpy", context=context)
+
+    def persistent(fn):
+        return fn
+
+    bpy.app = _module(
+        "bpy.app",
+        version=(4, 2, 0),
+        background=False,
+        tempdir="/tmp/",
+        handlers=types.SimpleNamespace(
+            persistent=persistent, depsgraph_update_pre=[], load_post=[]),
+        translations=types.SimpleNamespace(
+            pgettext_iface=lambda text, _ctx=None: text),
+    )
+
+    enum_items = [_EnumItem(identifier, i)
+                  for i, identifier in enumerate(_EVENT_TYPE_IDENTIFIERS)]
+    event_rna = types.SimpleNamespace(
+        properties={"type": types.SimpleNamespace(enum_items=enum_items)})
+
+    class _Event:
+        # pylint: disable=R0903
+        bl_rna = event_rna
+
+    space_classes = {
+        name: type(name, (_Space,), {"bl_rna": types.SimpleNamespace(
+            name=name.replace("Space", "") + " Space")})
+        for name in ["SpaceView3D", "SpaceClipEditor", "SpaceConsole",
+                     "SpaceDopeSheetEditor", "SpaceFileBrowser",
+                     "SpaceGraphEditor", "SpaceImageEditor", "SpaceInfo",
+                     "SpaceNLA", "SpaceNodeEditor", "SpaceOutliner",
+                     "SpacePreferences", "SpaceProperties",
+                     "SpaceSequenceEditor", "SpaceSpreadsheet",
+                     "SpaceTextEditor"]
+    }
+
+    bpy.types = _module(
+        "bpy.types",
+        Event=_Event,
+        Operator=type("Operator", (), {}),
+        Panel=type("Panel", (), {}),
+        AddonPreferences=type("AddonPreferences", (_RNAStruct,), {}),
+        PropertyGroup=type("PropertyGroup", (_RNAStruct,), {}),
+        WindowManager=type("WindowManager", (), {}),
+        **space_classes,
+    )
+
+    prop_kinds = ["BoolProperty", "IntProperty", "FloatProperty",
+                  "StringProperty", "EnumProperty", "FloatVectorProperty",
+                  "IntVectorProperty", "CollectionProperty",
+                  "PointerProperty"]
+    bpy.props = _module("bpy.props",
+                        **{k: _make_prop(k) for k in prop_kinds})
+    bpy.utils = _module(
+        "bpy.utils",
+        register_class=lambda cls: None,
+        unregister_class=lambda cls: None,
+        user_resource=lambda *_: "/tmp/",
+    )
+    bpy.data = types.SimpleNamespace(
+        images=_Images(), filepath="", is_saved=False)
+    bpy.ops = types.SimpleNamespace()
+    bpy.path = _module("bpy.path", abspath=lambda path: path)
+
+    _module(
+        "blf",
+        SHADOW=1 << 2,
+        size=_blf_size,
+        dimensions=_blf_dimensions,
+        position=_blf_noop,
+        color=_blf_noop,
+        draw=_blf_counted("draw"),
+        enable=_blf_noop,
+        disable=_blf_noop,
+        shadow=_blf_noop,
+        shadow_offset=_blf_noop,
+    )
+
+    gpu = _module("gpu")
+
+    class _BlendState:
+        mode = 'NONE'
+
+    def blend_set(mode):
+        _BlendState.mode = mode
+
+    gpu.state = _module(
+        "gpu.state",
+        blend_get=lambda: _BlendState.mode,
+        blend_set=blend_set,
+        scissor_test_set=lambda _enable: None,
+        scissor_set=lambda *_: None,
+        scissor_get=lambda: (0, 0, 1920, 1080),
+        active_framebuffer_get=_FrameBuffer,
+    )
+    gpu.matrix = _module(
+        "gpu.matrix",
+        get_projection_matrix=_Matrix,
+        get_model_view_matrix=_Matrix,
+        push_pop=_MatrixPushPop,
+        push_pop_projection=_MatrixPushPop,
+        translate=lambda _offset: None,
+        scale=lambda _s: None,
+        load_identity=lambda: None,
+        load_projection_matrix=lambda _m: None,
+    )
+    _module("mathutils", Matrix=types.SimpleNamespace(
+        Identity=lambda n: _Matrix()))
+    gpu.shader = _module(
+        "gpu.shader",
+        from_builtin=_Shader,
+    )
+    gpu.types = _module(
+        "gpu.types",
+        GPUShader=lambda *_, **__: _Shader("CUSTOM"),
+        GPUOffScreen=_OffScreen,
+    )
+    gpu.texture = _module("gpu.texture", from_image=_gpu_texture_from_image)
+    gpu.platform = _module(
+        "gpu.platform", backend_type_get=lambda: 'OPENGL')
+
+    gpu_extras = _module("gpu_extras")
+    gpu_extras.batch = _module("gpu_extras.batch",
+                               batch_for_shader=_batch_for_shader)
+
+    return context
+
+
+def build_screen(ctx, num_windows=1, areas_per_window=4,
+                 window_size=(1920, 1080)):
+    """Create windows laid out as a grid of areas."""
+
+    ctx.window_manager.windows = []
+    area_types = ['VIEW_3D', 'OUTLINER', 'PROPERTIES', 'IMAGE_EDITOR',
+                  'NODE_EDITOR', 'TEXT_EDITOR', 'CONSOLE', 'INFO']
+    width, height = window_size
+    for _ in range(num_windows):
+        cols = max(1, int(areas_per_window ** 0.5))
+        rows = (areas_per_window + cols - 1) // cols
+        aw, ah = width // cols, height // rows
+        areas = []
+        for i in range(areas_per_window):
+            c, r = i % cols, i // cols
+            areas.append(Area(area_types[i % len(area_types)],
+                              c * aw, r * ah, aw, ah))
+        window = Window(Screen(areas), width, height)
+        ctx.window_manager.windows.append(window)
+
+    window = ctx.window_manager.windows[0]
+    ctx.window = window
+    ctx.screen = window.screen
+    ctx.area = window.screen.areas[0]
+    ctx.region = [r for r in ctx.area.regions if r.type == 'WINDOW'][0]
+    ctx.space_data = ctx.area.spaces.active
+    return ctx
+
+
+def make_preferences(ctx, prefs_class, package="screencast_keys"):
+    prefs = _instantiate(prefs_class)
+    ctx.preferences.addons[package] = types.SimpleNamespace(
+        preferences=prefs)
+    return prefs
+
+
+def instantiate(cls):
+    return _instantiate(cls)
+
+
+def run_draw_handlers(ctx, only_tagged=False):
+    """Invoke the registered POST_PIXEL handlers for every region.
+
+    If only_tagged is True, only the regions tagged by tag_redraw are
+    redrawn like Blender does.
+    """
+
+    tagged = set(TAGGED_REGIONS)
+    TAGGED_REGIONS.clear()
+    for area in ctx.screen.areas:
+        for region in area.regions:
+            if only_tagged and region not in tagged:
+                continue
+            for space_cls, fn, args, region_type, _ in \
+                    list(_Space.draw_handlers):
+                if region_type != region.type:
+                    continue
+                if space_cls.__name__ != _space_class_name(area.type):
+                    continue
+                ctx.area = area
+                ctx.region = region
+                ctx.space_data = area.spaces.active
+                CALLS["draw_callback"] += 1
+                fn(*args)
+
+
+def _space_class_name(area_type):
+    return {
+        'VIEW_3D': "SpaceView3D",
+        'OUTLINER': "SpaceOutliner",
+        'PROPERTIES': "SpaceProperties",
+        'IMAGE_EDITOR': "SpaceImageEditor",
+        'NODE_EDITOR': "SpaceNodeEditor",
+        'TEXT_EDITOR': "SpaceTextEditor",
+        'CONSOLE': "SpaceConsole",
+        'INFO': "SpaceInfo",
+    }.get(area_type, "")
@@ -0,0 +1,398 @@
+"""Benchmarks of the modal/draw pipeline of Screencast Keys.
+
+The benchmarks run under plain CPython without Blender. bpy, blf and gpu are
+replaced by the stand-in modules in fake_blender.py, and synthetic event
+streams are replayed through SK_OT_ScreencastKeys.modal and the registered
+draw callbacks.
+
+Usage:
+    python3 tests/benchmark/run_benchmarks.py [-s SCENARIO ...] [-r REPEAT]
+                                              [--json FILE] [--check FILE]
+
+peak_alloc_kib_per_frame is the peak of the memory traced by tracemalloc
+during a frame, which is not the total size of the allocations.
+
+The call counts are deterministic under the virtual clock. --check compares
+them against the upper limits in FILE (e.g. tests/benchmark/limits.json)
+and exits with status 1 if any limit is exceeded.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.normpath(os.path.join(BENCHMARK_DIR, "..", "..", "src"))
+sys.path.insert(0, BENCHMARK_DIR)
+sys.path.insert(0, SRC_DIR)
+
+import fake_blender     # noqa # pylint: disable=C0413
+
+
+# Counters reported per frame or per event.
+REPORTED_CALLS = [
+    ("blf.draw", "frame"),
+    ("blf.dimensions", "frame"),
+    ("batch.draw", "frame"),
+    ("batch_for_shader", "frame"),
+    ("rna.getattr", "frame"),
+    ("draw_callback", "frame"),
+    ("region.tag_redraw", "event"),
+]
+
+
+class VirtualClock:
+    """Replacement of time.time which advances only by advance()."""
+
+    def __init__(self, start=1000.0):
+        self.now = start
+        self.original = None
+
+    def time(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+    def __enter__(self):
+        self.original = time.time
+        time.time = self.time
+        return self
+
+    def __exit__(self, *_):
+        time.time = self.original
+
+
+class Scenario:
+    """Synthetic event stream replayed on a simulated screen.
+
+    Subclasses define steps(), which yields
+    ('EVENT', fake_blender.Event, delta_time),
+    ('OPERATOR', fake_blender.Operator) or ('FRAME', delta_time).
+    """
+
+    name = ""
+    description = ""
+    num_windows = 1
+    areas_per_window = 4
+    num_initial_operators = 0
+    preferences = {}
+
+
+class TypingBurst(Scenario):
+    name = "typing_burst"
+    description = "Key presses with modifiers, one frame per key"
+
+    def steps(self):
+        keys = ["A", "B", "C", "A", "A", "Z", "SPACE", "RET", "TAB", "X"]
+        for i in range(400):
+            key = keys[i % len(keys)]
+            yield ('EVENT', fake_blender.Event(
+                key, 'PRESS', 200, 200, ctrl=(i % 3 == 0),
+                shift=(i % 5 == 0)), 0.04)
+            yield ('EVENT', fake_blender.Event(key, 'RELEASE', 200, 200),
+                   0.03)
+            yield ('FRAME', 0.0)
+
+
+class MouseMoveFlood(Scenario):
+    name = "mousemove_flood"
+    description = "MOUSEMOVE events at 250 Hz, frames at 60 Hz"
+
+    def steps(self):
+        for i in range(2000):
+            yield ('EVENT', fake_blender.Event(
+                'MOUSEMOVE', 'NOTHING', 100 + i % 800, 100 + i % 600), 0.004)
+            if i % 4 == 0:
+                yield ('FRAME', 0.0)
+
+
+class WheelBurst(Scenario):
+    name = "wheel_burst"
+    description = "Bursts of wheel events at 100 Hz, frames at 60 Hz"
+    preferences = {"mouse_events_show_mode": 'EVENT_HISTORY'}
+
+    def steps(self):
+        for i in range(1200):
+            event_type = 'WHEELUPMOUSE' if (i // 100) % 2 == 0 \
+                else 'WHEELDOWNMOUSE'
+            yield ('EVENT', fake_blender.Event(
+                event_type, 'PRESS', 200, 200), 0.01)
+            if i % 2 == 0:
+                yield ('FRAME', 0.0)
+
+
+class OperatorStack(Scenario):
+    name = "operator_stack"
+    description = "Operator executed per key on a long operator stack"
+    num_initial_operators = 1000
+    preferences = {"show_last_operator": True}
+
+    def steps(self):
+        for i in range(300):
+            yield ('OPERATOR', fake_blender.Operator(
+                "MESH_OT_extrude_{}".format(i % 7), "Extrude"))
+            yield ('EVENT', fake_blender.Event("E", 'PRESS', 200, 200), 0.05)
+            yield ('EVENT', fake_blender.Event("E", 'RELEASE', 200, 200),
+                   0.05)
+            yield ('FRAME', 0.0)
+
+
+class ManyAreas(Scenario):
+    name = "many_areas"
+    description = "Typing on 4 windows with 16 areas each"
+    num_windows = 4
+    areas_per_window = 16
+
+    def steps(self):
+        return TypingBurst().steps()
+
+
+class IdleFrames(Scenario):
+    name = "idle_frames"
+    description = "Frames and TIMER events while nothing is changed"
+
+    def steps(self):
+        for i in range(20):
+            yield ('EVENT', fake_blender.Event("ABC"[i % 3], 'PRESS'), 0.05)
+        for _ in range(500):
+            yield ('EVENT', fake_blender.Event('TIMER', 'NOTHING'), 0.016)
+            yield ('FRAME', 0.0)
+
+
+class CursorOrigin(Scenario):
+    name = "cursor_origin"
+    description = "Overlay following the mouse cursor"
+    preferences = {"origin": 'CURSOR', "background": True}
+
+    def steps(self):
+        for i in range(1000):
+            yield ('EVENT', fake_blender.Event(
+                'MOUSEMOVE', 'NOTHING', 100 + i % 800, 100 + i % 600), 0.008)
+            if i % 50 == 0:
+                yield ('EVENT', fake_blender.Event("G", 'PRESS'), 0.0)
+            yield ('FRAME', 0.0)
+
+
+class CursorOriginOffScreen(Scenario):
+    name = "cursor_origin_offscreen"
+    description = "Overlay following the mouse cursor with the offscreen " \
+        "rendering"
+    preferences = {"origin": 'CURSOR', "background": True,
+                   "use_offscreen_rendering": True}
+
+    def steps(self):
+        return CursorOrigin().steps()
+
+
+class OffScreenRendering(Scenario):
+    name = "offscreen_rendering"
+    description = "Typing with the experimental offscreen rendering"
+    preferences = {"use_offscreen_rendering": True, "background": True}
+
+    def steps(self):
+        return TypingBurst().steps()
+
+
+SCENARIOS = [
+    TypingBurst,
+    MouseMoveFlood,
+    WheelBurst,
+    OperatorStack,
+    ManyAreas,
+    IdleFrames,
+    CursorOrigin,
+    CursorOriginOffScreen,
+    OffScreenRendering,
+]
+
+
+class Bench:
+    """Run scenarios on the add-on loaded with the stand-in modules."""
+
+    def __init__(self):
+        self.context = fake_blender.install()
+        # Import after the stand-in modules are installed.
+        # pylint: disable=C0415
+        from screencast_keys import ops, preferences
+        self.ops = ops
+        self.preferences_class = preferences.SK_Preferences
+
+    def setup(self, scenario):
+        ctx = self.context
+        fake_blender.build_screen(ctx, scenario.num_windows,
+                                  scenario.areas_per_window)
+        prefs = fake_blender.make_preferences(ctx, self.preferences_class)
+        for name, value in scenario.preferences.items():
+            setattr(prefs, name, value)
+        ctx.window_manager.operators = [
+            fake_blender.Operator("OBJECT_OT_select_all", "(De)select All")
+            for _ in range(scenario.num_initial_operators)
+        ]
+
+        op = fake_blender.instantiate(self.ops.SK_OT_ScreencastKeys)
+        op.restart = False
+        op.invoke(ctx, fake_blender.Event('NONE', 'NOTHING'))
+        return op
+
+    def teardown(self, op):
+        if self.ops.SK_OT_ScreencastKeys.is_running():
+            op.invoke(self.context, fake_blender.Event('NONE', 'NOTHING'))
+
+    def run(self, scenario, trace_memory=False):
+        """Replay the scenario once and return the measurements."""
+
+        ctx = self.context
+        result = {
+            "events": 0,
+            "frames": 0,
+            "event_time": 0.0,
+            "frame_time": 0.0,
+            "frame_peak_alloc": 0,
+        }
+        with VirtualClock() as clock:
+            op = self.setup(scenario)
+            fake_blender.CALLS.clear()
+            for step in scenario.steps():
+                if step[0] == 'EVENT':
+                    _, event, delta_time = step
+                    clock.advance(delta_time)
+                    start = time.perf_counter()
+                    op.modal(ctx, event)
+                    result["event_time"] += time.perf_counter() - start
+                    result["events"] += 1
+                elif step[0] == 'OPERATOR':
+                    ctx.window_manager.operators.append(step[1])
+                elif step[0] == 'FRAME':
+                    clock.advance(step[1])
+                    if trace_memory:
+                        tracemalloc.reset_peak()
+                        base, _ = tracemalloc.get_traced_memory()
+                    start = time.perf_counter()
+                    fake_blender.run_draw_handlers(ctx, only_tagged=True)
+                    result["frame_time"] += time.perf_counter() - start
+                    if trace_memory:
+                        _, peak = tracemalloc.get_traced_memory()
+                        result["frame_peak_alloc"] += peak - base
+                    result["frames"] += 1
+            result["calls"] = dict(fake_blender.CALLS)
+            self.teardown(op)
+
+        return result
+
+
+def per(value, count):
+    return value / count if count else 0.0
+
+
+def run_scenario(bench, scenario_class, repeat):
+    scenario = scenario_class()
+
+    # Take the best time of the repeated runs.
+    results = [bench.run(scenario) for _ in range(repeat)]
+    best = min(results, key=lambda r: r["event_time"] + r["frame_time"])
+
+    tracemalloc.start()
+    try:
+        traced = bench.run(scenario, trace_memory=True)
+    finally:
+        tracemalloc.stop()
+
+    report = {
+        "events": best["events"],
+        "frames": best["frames"],
+        "us_per_event": per(best["event_time"], best["events"]) * 1e6,
+        "us_per_frame": per(best["frame_time"], best["frames"]) * 1e6,
+        "peak_alloc_kib_per_frame":
+            per(traced["frame_peak_alloc"], traced["frames"]) / 1024,
+    }
+    for name, unit in REPORTED_CALLS:
+        count = best["calls"].get(name, 0)
+        if unit == "frame":
+            report[name + "/frame"] = per(count, best["frames"])
+        else:
+            report[name + "/event"] = per(count, best["events"])
+    return report
+
+
+def print_report(reports):
+    columns = ["us_per_event", "us_per_frame",
+               "peak_alloc_kib_per_frame"] + \
+        [name + "/" + unit for name, unit in REPORTED_CALLS]
+
+    name_width = max([len("scenario")] + [len(n) for n in reports]) + 2
+    widths = [len(c) + 2 for c in columns]
+
+    header = "".join(c.rjust(w) for c, w in zip(columns, widths))
+    print("scenario".ljust(name_width) + header)
+    for name, report in reports.items():
+        values = "".join("{:.2f}".format(report[c]).rjust(w)
+                         for c, w in zip(columns, widths))
+        print(name.ljust(name_width) + values)
+
+
+def check_limits(reports, limits):
+    """Return the messages of the values exceeding the limits.
+
+    limits format: {scenario_name: {column: upper_limit}}
+    """
+
+    errors = []
+    for name, report in reports.items():
+        for column, limit in limits.get(name, {}).items():
+            if report[column] > limit:
+                errors.append("{}: {} = {:.2f} exceeds the limit {:.2f}"
+                              .format(name, column, report[column], limit))
+    return errors
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description="Benchmark the modal/draw pipeline of Screencast Keys")
+    parser.add_argument(
+        "-s", "--scenario", action="append",
+        choices=[s.name for s in SCENARIOS],
+        help="Scenario to run (default: all)")
+    parser.add_argument(
+        "-r", "--repeat", type=int, default=3,
+        help="Number of runs per scenario, the best one is reported")
+    parser.add_argument(
+        "--json", metavar="FILE",
+        help="Write the results to FILE as JSON")
+    parser.add_argument(
+        "--check", metavar="FILE",
+        help="Fail if the call counts exceed the limits in FILE")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    bench = Bench()
+    reports = {}
+    for scenario_class in SCENARIOS:
+        if args.scenario and scenario_class.name not in args.scenario:
+            continue
+        reports[scenario_class.name] = run_scenario(
+            bench, scenario_class, args.repeat)
+
+    print_report(reports)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(reports, f, indent=2, sort_keys=True)
+
+    if args.check:
+        with open(args.check, "r", encoding="utf-8") as f:
+            errors = check_limits(reports, json.load(f))
+        for error in errors:
+            print(error)
+        if errors:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,7 @@ def test_main():
     import screencast_keys_test     # pylint: disable=C0415
 
     test_cases = [
+        screencast_keys_test.cache_test.TestCaches,
         screencast_keys_test.ops_test.TestOps,
         screencast_keys_test.preferences_test.TestPreferences,
         screencast_keys_test.ui_test.TestUI,
@@ -1,3 +1,4 @@
+from . import cache_test
 from . import ops_test
 from . import preferences_test
 from . import ui_test
@@ -0,0 +1,209 @@
+import importlib
+
+import blf
+
+from . import common
+
+
+class Pointer:
+    # pylint: disable=R0903
+    next_pointer = 1
+
+    def __init__(self):
+        self.pointer = Pointer.next_pointer
+        Pointer.next_pointer += 1
+
+    def as_pointer(self):
+        return self.pointer
+
+
+class Region(Pointer):
+    # pylint: disable=R0903
+    def __init__(self, type_, x, y, width, height):
+        super().__init__()
+        self.type = type_
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+
+
+class Space(Pointer):
+    # pylint: disable=R0903
+    pass
+
+
+class Spaces(list):
+    @property
+    def active(self):
+        return self[0]
+
+
+class Area(Pointer):
+    # pylint: disable=R0903
+    def __init__(self, x, y, width, height):
+        super().__init__()
+        self.type = 'VIEW_3D'
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.spaces = Spaces([Space()])
+        self.regions = [
+            Region('WINDOW', x, y, width, height),
+            Region('UI', x + width - 1, y, 1, height),
+        ]
+
+
+class Screen(Pointer):
+    # pylint: disable=R0903
+    def __init__(self, areas):
+        super().__init__()
+        self.areas = areas
+
+
+class TestCaches(common.TestBase):
+    module_name = "ops"
+    submodule_name = "caches"
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.ops = importlib.import_module(cls.package_name + ".ops")
+
+    def test_region_resized_in_same_area(self):
+        area = Area(0, 0, 800, 600)
+        screen = Screen([area, Area(800, 0, 800, 600)])
+        layout = self.ops.ScreenLayoutCache()
+        self.assertTrue(layout.update(screen))
+        self.assertFalse(layout.update(screen))
+
+        # Only the right edge of the area is under the overlay.
+        rects = [(700, 100, 790, 200)]
+        found = layout.find_regions(screen, rects)
+        self.assertEqual(found, [(area, area.regions[0])])
+
+        # Sidebar grows without resizing the area.
+        ui = area.regions[1]
+        ui.x = 600
+        ui.width = 200
+        generation = layout.generation
+        self.assertTrue(layout.update(screen))
+        self.assertGreater(layout.generation, generation)
+        self.assertIsNone(layout.region_index)
+        found = layout.find_regions(screen, rects)
+        self.assertEqual(found, [(area, area.regions[0]), (area, ui)])
+
+        # Cheap check does not read the regions.
+        ui.width = 100
+        self.assertFalse(layout.update(screen, full_check=False))
+
+    def test_region_index_rebuilt_on_region_change(self):
+        area = Area(0, 0, 800, 600)
+        screen = Screen([area])
+        layout = self.ops.ScreenLayoutCache()
+        layout.update(screen)
+        rects = [(100, 100, 200, 200)]
+
+        found = layout.find_regions(screen, rects)
+        self.assertEqual(found, [(area, area.regions[0])])
+        index = layout.region_index
+        self.assertEqual(layout.find_regions(screen, rects), found)
+        self.assertIs(layout.region_index, index)
+
+        # Region is replaced.
+        area.regions[0] = Region('WINDOW', 0, 0, 800, 600)
+        self.assertIsNone(index.find(screen, rects))
+        found = layout.find_regions(screen, rects)
+        self.assertEqual(found, [(area, area.regions[0])])
+        self.assertIsNot(layout.region_index, index)
+
+        # Region is moved.
+        index = layout.region_index
+        area.regions[0].x = 300
+        self.assertIsNone(index.find(screen, rects))
+        self.assertEqual(layout.find_regions(screen, rects), [])
+        self.assertIsNot(layout.region_index, index)
+
+    def test_text_metrics_lru(self):
+        metrics = self.ops.TextMetricsCache(capacity=2)
+        metrics.set_size(0, 12, 72, 1.0)
+
+        self.assertEqual(metrics.dimensions(0, "a"),
+                         tuple(blf.dimensions(0, "a")))
+        metrics.dimensions(0, "b")
+        metrics.dimensions(0, "a")
+        self.assertEqual((metrics.hits, metrics.misses), (1, 2))
+
+        # "b" is the least recently used.
+        metrics.dimensions(0, "c")
+        self.assertEqual(len(metrics.cache), 2)
+        metrics.dimensions(0, "a")
+        self.assertEqual((metrics.hits, metrics.misses), (2, 3))
+        metrics.dimensions(0, "b")
+        self.assertEqual((metrics.hits, metrics.misses), (2, 4))
+
+    def test_text_metrics_invalidation(self):
+        metrics = self.ops.TextMetricsCache()
+        metrics.set_size(0, 12, 72, 1.0)
+        metrics.dimensions(0, "a")
+
+        # Same size keeps the cache.
+        metrics.set_size(0, 12, 72, 1.0)
+        self.assertEqual(len(metrics.cache), 1)
+
+        # Font size is changed.
+        metrics.set_size(0, 16, 72, 1.0)
+        self.assertEqual(len(metrics.cache), 0)
+        metrics.dimensions(0, "a")
+        self.assertEqual(metrics.misses, 2)
+
+        # DPI is changed.
+        metrics.set_size(0, 16, 96, 1.0)
+        self.assertEqual(len(metrics.cache), 0)
+
+        # UI scale is a part of the key.
+        metrics.dimensions(0, "a")
+        metrics.set_size(0, 16, 96, 2.0)
+        self.assertEqual(len(metrics.cache), 1)
+        metrics.dimensions(0, "a")
+        self.assertEqual(metrics.misses, 4)
+
+    def test_operator_history(self):
+        tracker = self.ops.OperatorHistoryTracker()
+        ops = [Pointer() for _ in range(5)]
+
+        self.assertEqual(tracker.new_operators(ops[0:3]), ops[0:3])
+        self.assertEqual(tracker.new_operators(ops[0:3]), [])
+
+        # Appended.
+        self.assertEqual(tracker.new_operators(ops[0:4]), [ops[3]])
+
+        # Stack is full. The oldest operator is removed.
+        self.assertEqual(tracker.new_operators(ops[1:5]), [ops[4]])
+        self.assertEqual(tracker.new_operators(ops[1:5]), [])
+
+        # Stack is cleared.
+        self.assertEqual(tracker.new_operators([]), [])
+        self.assertEqual(tracker.new_operators(ops[0:1]), [ops[0]])
+
+        self.assertEqual(tracker.idname_py("MESH_OT_extrude"),
+                         "mesh.extrude")
+
+    def test_display_event_text_invalidation(self):
+        index = self.ops.DisplayEventTextIndex()
+        text = index.get('A')
+        modifier_text = index.get_modifier_text(1)
+        self.assertIsNotNone(index.index)
+        self.assertIsNotNone(index.modifier_texts)
+        generation = index.generation
+
+        index.invalidate()
+        self.assertGreater(index.generation, generation)
+        self.assertIsNone(index.index)
+        self.assertIsNone(index.modifier_texts)
+
+        # Rebuilt on the next lookup.
+        self.assertEqual(index.get('A'), text)
+        self.assertEqual(index.get_modifier_text(1), modifier_text)
+        self.assertEqual(index.get('NOT_EXIST'), "UNKNOWN")
@@ -6,6 +6,7 @@ class TestOps(common.TestBase):
     idname = [
         ('OPERATOR', 'wm.sk_screencast_keys'),
         ('OPERATOR', 'wm.sk_set_origin'),
+        ('OPERATOR', 'wm.sk_dump_profile'),
         ('OPERATOR',
          'wm.sk_wait_blender_initialized_and_start_screencast_keys'),
     ]